@@ -1,6 +1,5 @@
 import streamlit as st
 import datetime
-import re
 import os
 import sys
 # Add the project root to the Python path BEFORE imports
@@ -11,23 +10,14 @@ if project_root not in sys.path:
 from app import auth
 from common import login
 import importlib
+from urllib.parse import urlparse, parse_qs
 
 # Page Config
 st.set_page_config(page_title="Fyer Fighter", layout="wide")
 
 # Initialize session state
-if 'authenticated_user' not in st.session_state:
-    st.session_state.authenticated_user = None
-if 'fyers_client' not in st.session_state:
-    st.session_state.fyers_client = None
-if 'current_strategy' not in st.session_state:
-    st.session_state.current_strategy = None
-if 'fyers_token' not in st.session_state:
-    st.session_state.fyers_token = None
-if 'show_token_modal' not in st.session_state:
-    st.session_state.show_token_modal = False
-if 'regenerate_token' not in st.session_state:
-    st.session_state.regenerate_token = False
+for key in ("authenticated_user", "fyers_client", "current_strategy", "fyers_token", "show_token_modal", "regenerate_token"):
+    st.session_state.setdefault(key, False if key in ("show_token_modal", "regenerate_token") else None)
 
 STRATEGIES = {
     "Bar Up Down": {
@@ -46,6 +36,7 @@ STRATEGIES = {
         "trade_func": "show_trade"
     }
 }
+STRATEGY_NAMES = tuple(STRATEGIES)
 
 @st.cache_resource
 def load_strategy_module(module_path):
@@ -55,17 +46,18 @@ def load_strategy_module(module_path):
     except (ImportError, ModuleNotFoundError):
         return None
 
+@st.cache_resource
 def get_available_strategies():
-    """Get list of available strategies with their UI modules loaded."""
+    """Resolve each strategy to its (module, backtest_func, trade_func) once per process."""
     available = {}
     for strategy_name, config in STRATEGIES.items():
         module = load_strategy_module(config["module"])
-        if module:
-            available[strategy_name] = {
-                "module": module,
-                "backtest_func": config["backtest_func"],
-                "trade_func": config["trade_func"]
-            }
+        if not module:
+            continue
+        backtest_func = getattr(module, config["backtest_func"], None)
+        trade_func = getattr(module, config["trade_func"], None)
+        if backtest_func and trade_func:
+            available[strategy_name] = (module, backtest_func, trade_func)
     return available
 
 def show_strategy_ui(strategy_name):
@@ -74,22 +66,12 @@ def show_strategy_ui(strategy_name):
         st.error(f"Strategy '{strategy_name}' not found.")
         return
     
-    strategy_config = STRATEGIES[strategy_name]
-    module = load_strategy_module(strategy_config["module"])
-    
-    if not module:
-        st.info(f"{strategy_name} strategy interface coming soon...")
-        return
-    
-    backtest_func_name = strategy_config["backtest_func"]
-    trade_func_name = strategy_config["trade_func"]
-    
-    if not (hasattr(module, backtest_func_name) and hasattr(module, trade_func_name)):
+    strategy = get_available_strategies().get(strategy_name)
+    if not strategy:
         st.info(f"{strategy_name} strategy interface coming soon...")
         return
     
-    backtest_func = getattr(module, backtest_func_name)
-    trade_func = getattr(module, trade_func_name)
+    _, backtest_func, trade_func = strategy
     
     tab1, tab2 = st.tabs(["Backtest", "Trade"])
     with tab1:
@@ -97,7 +79,45 @@ def show_strategy_ui(strategy_name):
     with tab2:
         trade_func()
 
+def _session_get_credentials(username):
+    """Return the user's decrypted API credentials and stored token, loaded once per session."""
+    cache = st.session_state.setdefault("_credentials_cache", {})
+    entry = cache.get(username)
+    if entry is None:
+        entry = {
+            "api_credentials": auth.load_api_credentials(username),
+            "fyers_token": auth.load_fyers_token(username)
+        }
+        cache[username] = entry
+    return entry
+
+def _invalidate_credentials(username):
+    """Drop the session's cached credentials so the next read hits the store."""
+    st.session_state.get("_credentials_cache", {}).pop(username, None)
+
+def _logout():
+    """Clear the user's session state."""
+    if "bu_ws" in st.session_state:
+        # The Bar Up/Down price feed was opened with this user's token
+        from barupdown.streamlit_app import stop_price_stream
+        stop_price_stream()
+    _invalidate_credentials(st.session_state.authenticated_user)
+    # Decrypted per-user keys must not stay in the session after logout
+    st.session_state.pop("_user_cipher", None)
+    login.discard_fyers_client(st.session_state.fyers_client)
+    st.session_state.authenticated_user = None
+    st.session_state.fyers_client = None
+    st.session_state.current_strategy = None
+    st.session_state.fyers_token = None
+    st.session_state.regenerate_token = False
+    st.session_state.show_token_modal = False
+
 # --- UI for the main dashboard ---
+@st.fragment(run_every="1s")
+def render_clock():
+    """Refresh only the clock each second instead of rerunning the whole dashboard."""
+    st.write(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
 def show_dashboard():
     # --- Row 1: Title ---
     st.title("Fyer Fighter")
@@ -110,7 +130,7 @@ def show_dashboard():
         else:
             st.markdown("[Login / Register](#user-menu)")
     with col2:
-        st.write(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        render_clock()
 
     st.markdown("---")
 
@@ -120,9 +140,7 @@ def show_dashboard():
     # Column 1: Strategy List
     with col1:
         st.subheader("Strategies")
-        for strategy_name in STRATEGIES.keys():
-            if st.button(strategy_name):
-                st.session_state.current_strategy = strategy_name
+        st.segmented_control("Strategies", STRATEGY_NAMES, key="current_strategy", label_visibility="collapsed")
 
     # Column 2: Strategy GUI
     with col2:
@@ -152,6 +170,7 @@ def show_dashboard():
                                 st.error("Both Client ID and Secret Key are required")
                             else:
                                 success, message = auth.save_api_credentials(st.session_state.authenticated_user, api_id, api_secret)
+                                _invalidate_credentials(st.session_state.authenticated_user)
                                 if success:
                                     st.success(message)
                                 else:
@@ -192,14 +211,9 @@ def show_dashboard():
                 st.session_state.regenerate_token = True
                 st.rerun()
             
-            if st.button("Logout"):
-                st.session_state.authenticated_user = None
-                st.session_state.fyers_client = None
-                st.session_state.current_strategy = None
-                st.session_state.fyers_token = None
-                st.session_state.regenerate_token = False
-                st.session_state.show_token_modal = False
-                st.rerun()
+            # Reset state in a callback: current_strategy is a widget key and
+            # cannot be assigned after the strategy selector has rendered.
+            st.button("Logout", on_click=_logout)
         else:
             with st.expander("Login / Register", expanded=True):
                 tab1, tab2 = st.tabs(["Login", "Register"])
@@ -214,6 +228,8 @@ def show_dashboard():
                             success, message = auth.authenticate_user(login_username, login_password)
                             if success:
                                 st.session_state.authenticated_user = login_username
+                                _invalidate_credentials(login_username)
+                                _session_get_credentials(login_username)
                                 st.success(message)
                                 st.rerun()
                             else:
@@ -246,8 +262,7 @@ def show_dashboard():
 
 # --- Fyers Token Modals and Initialization ---
 
-@st.dialog("Generate Fyers Token")
-def show_token_generation_dialog(client_id, secret_key):
+def _token_generation_dialog(client_id, secret_key):
     """Displays a dialog for the Fyers token generation process."""
     auth_url = login.generate_authcode_url(client_id, secret_key)
     st.info("Please log in to Fyers to generate an auth code.")
@@ -259,17 +274,18 @@ def show_token_generation_dialog(client_id, secret_key):
     with col1:
         if st.button("Generate"):
             if redirected_url:
-                match = re.search(r'auth_code=([^&]+)', redirected_url)
-                if match:
-                    auth_code = match.group(1)
+                auth_code = parse_qs(urlparse(redirected_url).query).get('auth_code', [None])[0]
+                if auth_code:
                     with st.spinner("Generating access token..."):
                         access_token = login.generate_access_token(auth_code, client_id, secret_key)
                     
                     if access_token:
                         st.session_state.fyers_token = access_token
                         auth.save_fyers_token(st.session_state.authenticated_user, access_token)
+                        _invalidate_credentials(st.session_state.authenticated_user)
                         st.session_state.regenerate_token = False
                         # Upon success, clear the old client to force re-initialization
+                        login.discard_fyers_client(st.session_state.fyers_client)
                         st.session_state.fyers_client = None 
                         st.success("Successfully generated and saved access token!")
                         st.rerun()
@@ -285,15 +301,14 @@ def show_token_generation_dialog(client_id, secret_key):
             st.rerun()
 
 
-@st.dialog("Fyers Token")
-def show_token_modal():
+def _token_modal():
     """Asks the user whether to use an existing token or generate a new one."""
     st.write("You have an existing Fyers token. Do you want to use it or generate a new one?")
     
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Use Existing Token"):
-            st.session_state.fyers_token = auth.load_fyers_token(st.session_state.authenticated_user)
+            st.session_state.fyers_token = _session_get_credentials(st.session_state.authenticated_user)["fyers_token"]
             st.session_state.show_token_modal = False
             st.session_state.regenerate_token = False
             st.rerun()
@@ -303,17 +318,13 @@ def show_token_modal():
             st.session_state.show_token_modal = False
             st.rerun()
 
-def initialize_fyers_client():
-    """Initializes the Fyers client if a token is available in the session state."""
-    if not st.session_state.fyers_token:
+def initialize_fyers_client(credentials, token):
+    """Initializes the Fyers client from the already-loaded credentials and token."""
+    if not token or not credentials:
         return
 
-    credentials = auth.load_api_credentials(st.session_state.authenticated_user)
-    if not credentials:
-        return 
-
     client_id = credentials['api_id']
-    fyers = login.initialize_fyers_client(client_id, st.session_state.fyers_token)
+    fyers = login.initialize_fyers_client(client_id, token)
     
     if fyers:
         st.session_state.fyers_client = fyers
@@ -323,6 +334,7 @@ def initialize_fyers_client():
         st.session_state.fyers_token = None
         st.session_state.fyers_client = None
         auth.save_fyers_token(st.session_state.authenticated_user, None)
+        _invalidate_credentials(st.session_state.authenticated_user)
         st.session_state.regenerate_token = True
         st.warning("Fyers client initialization failed. Your token may be expired.")
         st.rerun()
@@ -330,32 +342,34 @@ def initialize_fyers_client():
 # --- Main App Logic ---
 
 if st.session_state.authenticated_user:
+    # Load credentials and the stored token once for this rerun.
+    session_credentials = _session_get_credentials(st.session_state.authenticated_user)
+    credentials = session_credentials["api_credentials"]
+    stored_token = session_credentials["fyers_token"]
+
     # Priority 1: Handle an explicit request to regenerate the token.
     # This runs regardless of whether a client exists, allowing regeneration at any time.
     if st.session_state.get("regenerate_token"):
-        credentials = auth.load_api_credentials(st.session_state.authenticated_user)
         if not credentials:
             st.warning("Please enter your Fyers API credentials in the 'Account Details' section.")
             st.session_state.regenerate_token = False # Reset flag, can't proceed.
         else:
-            show_token_generation_dialog(credentials['api_id'], credentials['api_secret'])
+            # Wrapped only where shown, so logged-out reruns never build the dialogs
+            st.dialog("Generate Fyers Token")(_token_generation_dialog)(credentials['api_id'], credentials['api_secret'])
     
     # Priority 2: If not regenerating, and no client exists, run the initial setup.
     elif not st.session_state.fyers_client:
-        credentials = auth.load_api_credentials(st.session_state.authenticated_user)
-        stored_token = auth.load_fyers_token(st.session_state.authenticated_user)
-
         if not credentials:
             st.warning("Please enter your Fyers API credentials in the 'Account Details' section.")
         
         elif not st.session_state.fyers_token and stored_token:
-            show_token_modal()
+            st.dialog("Fyers Token")(_token_modal)()
         
         elif not st.session_state.fyers_token and not stored_token:
             st.session_state.regenerate_token = True
             st.rerun()
 
         elif st.session_state.fyers_token:
-            initialize_fyers_client()
+            initialize_fyers_client(credentials, st.session_state.fyers_token)
 
 show_dashboard()
@@ -1,143 +1,290 @@
+import base64
+import hashlib
 import json
 import os
-from pathlib import Path
+import tempfile
 import secrets
-import bcrypt
-from cryptography.fernet import Fernet
+import time
+import streamlit as st
 from dotenv import load_dotenv
 
 load_dotenv()
 
-import sys
-sys.path.append(str(Path(__file__).parent.parent))
-
 USE_SUPABASE = os.getenv("USE_SUPABASE", "false").lower() == "true"
 USERS_FILE = os.getenv("USERS_FILE_PATH", "app/app/utils/users.json")
+USERS_DIR = os.getenv("USERS_DIR_PATH") or os.path.join(os.path.dirname(USERS_FILE), "users")
 ENCRYPTION_MASTER_KEY = os.getenv("ENCRYPTION_MASTER_KEY")
+# Prefix marking AES-GCM encrypted user data; unprefixed values are legacy Fernet tokens.
+USER_DATA_V2_PREFIX = "v2|"
+# Pretty-print user files only when debugging; compact JSON is ~3x smaller.
+USERS_FILE_INDENT = 4 if os.getenv("DEBUG_USERS_FILE", "false").lower() == "true" else None
 
 if not ENCRYPTION_MASTER_KEY:
     raise ValueError("ENCRYPTION_MASTER_KEY environment variable not set. Please set it in .env or Render environment variables.")
 
-if USE_SUPABASE:
-    from supabase import create_client
-    SUPABASE_URL = os.getenv("SUPABASE_URL")
-    SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# bcrypt, cryptography and supabase are imported on first use so that a cold
+# start (e.g. the login page) does not pay for them up front.
+
+@st.cache_resource
+def _get_supabase():
+    """Return the shared Supabase client, or None when Supabase is not configured."""
+    if not USE_SUPABASE:
+        return None
+    from app.supabase_config import SUPABASE_URL, SUPABASE_KEY, get_supabase_client
     if SUPABASE_URL and SUPABASE_KEY:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    else:
-        supabase = None
-else:
-    supabase = None
+        return get_supabase_client()
+    return None
 
 def generate_user_encryption_key():
     """Generates a unique encryption key for a user."""
+    from cryptography.fernet import Fernet
     return Fernet.generate_key().decode()
 
+@st.cache_resource
+def _get_master_fernet():
+    """Build the MASTER_KEY Fernet once per process."""
+    from cryptography.fernet import Fernet
+    return Fernet(ENCRYPTION_MASTER_KEY.encode())
+
+def _get_user_cipher(username, encrypted_user_key):
+    """Return the user's (AESGCM, Fernet) pair, decrypting their key at most once per session.
+
+    Kept in st.session_state (not cache_resource) so decrypted key material
+    is never shared across sessions.
+    """
+    cache = st.session_state.setdefault("_user_cipher", {})
+    cipher = cache.get(username)
+    if cipher is None:
+        from cryptography.fernet import Fernet
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+        user_key = decrypt_with_master_key(encrypted_user_key).encode()
+        aes_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"fyerfighter-user-data").derive(user_key)
+        cipher = (AESGCM(aes_key), Fernet(user_key))
+        cache[username] = cipher
+    return cipher
+
 def encrypt_with_master_key(data):
     """Encrypts data using the MASTER_KEY."""
-    f = Fernet(ENCRYPTION_MASTER_KEY.encode())
-    return f.encrypt(data.encode()).decode()
+    return _get_master_fernet().encrypt(data.encode()).decode()
 
 def decrypt_with_master_key(encrypted_data):
     """Decrypts data using the MASTER_KEY."""
-    f = Fernet(ENCRYPTION_MASTER_KEY.encode())
-    return f.decrypt(encrypted_data.encode()).decode()
+    return _get_master_fernet().decrypt(encrypted_data.encode()).decode()
+
+def encrypt_user_data(data, user_cipher):
+    """Encrypts user data (credentials) with AES-GCM as "v2|" + base64(nonce || ciphertext)."""
+    aesgcm, _ = user_cipher
+    nonce = secrets.token_bytes(12)
+    payload = nonce + aesgcm.encrypt(nonce, data.encode(), None)
+    return USER_DATA_V2_PREFIX + base64.urlsafe_b64encode(payload).decode()
 
-def encrypt_user_data(data, user_key):
-    """Encrypts user data (credentials) using the user's decrypted key."""
-    f = Fernet(user_key.encode())
-    return f.encrypt(data.encode()).decode()
+def decrypt_user_data(encrypted_data, user_cipher):
+    """Decrypts user data, falling back to Fernet for values written before AES-GCM."""
+    aesgcm, fernet = user_cipher
+    if encrypted_data.startswith(USER_DATA_V2_PREFIX):
+        payload = base64.urlsafe_b64decode(encrypted_data[len(USER_DATA_V2_PREFIX):])
+        return aesgcm.decrypt(payload[:12], payload[12:], None).decode()
+    return fernet.decrypt(encrypted_data.encode()).decode()
 
-def decrypt_user_data(encrypted_data, user_key):
-    """Decrypts user data using the user's decrypted key."""
-    f = Fernet(user_key.encode())
-    return f.decrypt(encrypted_data.encode()).decode()
+def _row_to_user(row):
+    """Convert a Supabase users row into the in-app user dict."""
+    return {
+        "password_hash": row['password_hash'],
+        "encrypted_user_key": row['encrypted_user_key'],
+        "is_admin": row['is_admin'],
+        "email": row.get('email'),
+        "phone": row.get('phone'),
+        "api_credentials": json.loads(row['api_credentials']) if row.get('api_credentials') else None,
+        "fyers_token": row.get('fyers_token')
+    }
+
+def _user_to_row(username, user_data):
+    """Convert an in-app user dict into a Supabase users row."""
+    return {
+        "username": username,
+        "password_hash": user_data['password_hash'],
+        "encrypted_user_key": user_data['encrypted_user_key'],
+        "is_admin": user_data['is_admin'],
+        "email": user_data.get('email'),
+        "phone": user_data.get('phone'),
+        "api_credentials": json.dumps(user_data['api_credentials']) if user_data.get('api_credentials') else None,
+        "fyers_token": user_data.get('fyers_token')
+    }
+
+def _user_file(username):
+    """Path of the per-user JSON file for username."""
+    return os.path.join(USERS_DIR, hashlib.sha256(username.encode()).hexdigest() + ".json")
+
+def _write_user_file(username, user_data):
+    """Atomically write one user's JSON file (temp file + os.replace)."""
+    os.makedirs(USERS_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=USERS_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"username": username, **user_data}, f, indent=USERS_FILE_INDENT,
+                      separators=None if USERS_FILE_INDENT else (",", ":"))
+        os.replace(tmp_path, _user_file(username))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+@st.cache_resource
+def _user_index():
+    """Load every per-user file into an in-memory index once per process.
+
+    Users still in the legacy single USERS_FILE are migrated to per-user files.
+    """
+    if os.path.exists(USERS_FILE):
+        with open(USERS_FILE, 'r') as f:
+            for username, user_data in json.load(f).items():
+                if not os.path.exists(_user_file(username)):
+                    _write_user_file(username, user_data)
+
+    users = {}
+    if os.path.isdir(USERS_DIR):
+        for name in os.listdir(USERS_DIR):
+            if name.endswith(".json"):
+                with open(os.path.join(USERS_DIR, name), 'r') as f:
+                    user_data = json.load(f)
+                users[user_data.pop("username")] = user_data
+    return users
 
 def load_users():
-    """Load users from JSON file or Supabase."""
-    if USE_SUPABASE and supabase:
+    """Load all users from JSON file or Supabase (admin/export use only)."""
+    supabase = _get_supabase()
+    if supabase:
         try:
             response = supabase.table("users").select("*").execute()
-            users = {}
-            for user in response.data:
-                users[user['username']] = {
-                    "password_hash": user['password_hash'],
-                    "encrypted_user_key": user['encrypted_user_key'],
-                    "is_admin": user['is_admin'],
-                    "email": user.get('email'),
-                    "phone": user.get('phone'),
-                    "api_credentials": json.loads(user['api_credentials']) if user.get('api_credentials') else None,
-                    "fyers_token": user.get('fyers_token')
-                }
-            return users
+            return {user['username']: _row_to_user(user) for user in response.data}
         except Exception as e:
             print(f"Error loading users from Supabase: {e}")
             return {}
     else:
-        if os.path.exists(USERS_FILE):
-            with open(USERS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+        return {username: dict(user_data) for username, user_data in _user_index().items()}
 
 def save_users(users):
-    """Save users to JSON file or Supabase."""
-    if USE_SUPABASE and supabase:
+    """Save all users to JSON file or Supabase (admin/export use only)."""
+    supabase = _get_supabase()
+    if supabase:
         try:
-            for username, user_data in users.items():
-                api_creds = json.dumps(user_data['api_credentials']) if user_data.get('api_credentials') else None
-                
-                existing = supabase.table("users").select("*").eq("username", username).execute()
-                
-                if existing.data:
-                    supabase.table("users").update({
-                        "password_hash": user_data['password_hash'],
-                        "encrypted_user_key": user_data['encrypted_user_key'],
-                        "is_admin": user_data['is_admin'],
-                        "email": user_data.get('email'),
-                        "phone": user_data.get('phone'),
-                        "api_credentials": api_creds,
-                        "fyers_token": user_data.get('fyers_token')
-                    }).eq("username", username).execute()
-                else:
-                    supabase.table("users").insert({
-                        "username": username,
-                        "password_hash": user_data['password_hash'],
-                        "encrypted_user_key": user_data['encrypted_user_key'],
-                        "is_admin": user_data['is_admin'],
-                        "email": user_data.get('email'),
-                        "phone": user_data.get('phone'),
-                        "api_credentials": api_creds,
-                        "fyers_token": user_data.get('fyers_token')
-                    }).execute()
+            rows = [_user_to_row(username, user_data) for username, user_data in users.items()]
+            if rows:
+                supabase.table("users").upsert(rows, on_conflict="username").execute()
         except Exception as e:
             print(f"Error saving users to Supabase: {e}")
     else:
-        os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users, f, indent=4)
+        for username, user_data in users.items():
+            _save_user(username, user_data)
+
+def _load_user(username):
+    """Load a single user by username, or None if not found.
+
+    The returned dict also carries the password hash as bytes under "password_hash_b".
+    """
+    supabase = _get_supabase()
+    if supabase:
+        try:
+            response = supabase.table("users").select("*").eq("username", username).limit(1).execute()
+            user = _row_to_user(response.data[0]) if response.data else None
+        except Exception as e:
+            print(f"Error loading user from Supabase: {e}")
+            return None
+    else:
+        user_data = _user_index().get(username)
+        user = dict(user_data) if user_data is not None else None
+    if user is not None:
+        user["password_hash_b"] = (user.get("password_hash") or "").encode()
+    return user
+
+def _save_user(username, user_data, new=False):
+    """Save a single user; new users are inserted so an existing row is never overwritten."""
+    user_data = {k: v for k, v in user_data.items() if k != "password_hash_b"}
+    supabase = _get_supabase()
+    if supabase:
+        try:
+            row = _user_to_row(username, user_data)
+            if new:
+                supabase.table("users").insert(row).execute()
+            else:
+                supabase.table("users").upsert(row, on_conflict="username").execute()
+            return True
+        except Exception as e:
+            print(f"Error saving user to Supabase: {e}")
+            return False
+    else:
+        _write_user_file(username, user_data)
+        _user_index()[username] = dict(user_data)
+        return True
+
+@st.cache_resource
+def _calibrate_bcrypt_rounds(target_seconds=0.1, min_rounds=12, max_rounds=14):
+    """Pick the highest bcrypt cost whose hash stays within target_seconds on this host, never below min_rounds."""
+    import bcrypt
+    rounds = min_rounds
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(rounds=rounds))
+    elapsed = time.perf_counter() - start
+    # Each extra round doubles the cost.
+    while rounds < max_rounds and elapsed * 2 <= target_seconds:
+        rounds += 1
+        elapsed *= 2
+    return rounds
+
+def _bcrypt_rounds():
+    """bcrypt cost: BCRYPT_ROUNDS if set, otherwise calibrated on first use."""
+    return int(os.getenv("BCRYPT_ROUNDS") or _calibrate_bcrypt_rounds())
 
 def hash_password(password):
     """Hash password using bcrypt."""
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=12)).decode()
+    import bcrypt
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=_bcrypt_rounds())).decode()
 
 def verify_password(password, hashed_password):
-    """Verify password against bcrypt hash."""
+    """Verify password against a bcrypt hash given as str or bytes."""
+    import bcrypt
     try:
-        return bcrypt.checkpw(password.encode(), hashed_password.encode())
+        if isinstance(hashed_password, str):
+            hashed_password = hashed_password.encode()
+        # Reject anything that is not a bcrypt hash without paying the bcrypt cost.
+        if not hashed_password.startswith(b"$2"):
+            return False
+        return bcrypt.checkpw(password.encode(), hashed_password)
     except Exception:
         return False
 
+def _update_user_fields(username, fields):
+    """Update only the given fields of an existing user."""
+    supabase = _get_supabase()
+    if supabase:
+        try:
+            row = dict(fields)
+            if "api_credentials" in row:
+                row["api_credentials"] = json.dumps(row["api_credentials"]) if row["api_credentials"] else None
+            response = supabase.table("users").update(row).eq("username", username).execute()
+            # No rows back means the username matched nothing
+            return bool(response.data)
+        except Exception as e:
+            print(f"Error updating user in Supabase: {e}")
+            return False
+    else:
+        user_data = _user_index().get(username)
+        if user_data is None:
+            return False
+        return _save_user(username, {**user_data, **fields})
+
 def create_user(username, password, is_admin=False, email=None, phone=None):
     """Create a new user"""
-    users = load_users()
-    if username in users:
+    if _load_user(username) is not None:
         return False, "Username already exists"
     
     hashed_password = hash_password(password)
     user_encryption_key = generate_user_encryption_key()
     encrypted_user_key = encrypt_with_master_key(user_encryption_key)
     
-    users[username] = {
+    user = {
         "password_hash": hashed_password,
         "encrypted_user_key": encrypted_user_key,
         "is_admin": is_admin,
@@ -146,38 +293,43 @@ def create_user(username, password, is_admin=False, email=None, phone=None):
         "api_credentials": None,
         "fyers_token": None
     }
-    save_users(users)
+    if not _save_user(username, user, new=True):
+        return False, "Failed to create user"
     return True, "User created successfully"
 
 def authenticate_user(username, password):
     """Authenticate a user"""
-    users = load_users()
-    if username not in users:
+    if not username:
+        return False, "User not found"
+    user = _load_user(username)
+    if user is None:
         return False, "User not found"
     
-    user = users[username]
-    if verify_password(password, user["password_hash"]):
+    if verify_password(password, user["password_hash_b"]):
         return True, "Authentication successful"
     return False, "Invalid password"
 
 def save_api_credentials(username, api_id, api_secret):
     """Encrypt and save user's API credentials."""
-    users = load_users()
-    if username not in users:
+    if not username:
+        return False, "User not found"
+    user = _load_user(username)
+    if user is None:
         return False, "User not found"
     
     try:
-        encrypted_user_key = users[username]["encrypted_user_key"]
-        user_key = decrypt_with_master_key(encrypted_user_key)
+        user_cipher = _get_user_cipher(username, user["encrypted_user_key"])
         
-        encrypted_api_id = encrypt_user_data(api_id, user_key)
-        encrypted_api_secret = encrypt_user_data(api_secret, user_key)
+        encrypted_api_id = encrypt_user_data(api_id, user_cipher)
+        encrypted_api_secret = encrypt_user_data(api_secret, user_cipher)
         
-        users[username]["api_credentials"] = {
-            "api_id": encrypted_api_id,
-            "api_secret": encrypted_api_secret
-        }
-        save_users(users)
+        if not _update_user_fields(username, {
+            "api_credentials": {
+                "api_id": encrypted_api_id,
+                "api_secret": encrypted_api_secret
+            }
+        }):
+            return False, "Failed to save credentials."
         return True, "API credentials saved successfully."
     except Exception as e:
         print(f"Error saving credentials: {e}")
@@ -185,23 +337,23 @@ def save_api_credentials(username, api_id, api_secret):
 
 def load_api_credentials(username):
     """Load and decrypt user's API credentials."""
-    users = load_users()
-    if username not in users:
+    if not username:
+        return None
+    user_data = _load_user(username)
+    if user_data is None:
         return None
     
-    user_data = users[username]
     if not user_data.get("api_credentials"):
         return None
     
     try:
-        encrypted_user_key = user_data["encrypted_user_key"]
-        user_key = decrypt_with_master_key(encrypted_user_key)
+        user_cipher = _get_user_cipher(username, user_data["encrypted_user_key"])
         
         encrypted_api_id = user_data["api_credentials"]["api_id"]
         encrypted_api_secret = user_data["api_credentials"]["api_secret"]
         
-        api_id = decrypt_user_data(encrypted_api_id, user_key)
-        api_secret = decrypt_user_data(encrypted_api_secret, user_key)
+        api_id = decrypt_user_data(encrypted_api_id, user_cipher)
+        api_secret = decrypt_user_data(encrypted_api_secret, user_cipher)
         return {"api_id": api_id, "api_secret": api_secret}
     except Exception as e:
         print(f"Error decrypting credentials: {e}")
@@ -209,49 +361,54 @@ def load_api_credentials(username):
 
 def change_password(username, old_password, new_password):
     """Change user password after verifying the old password."""
-    users = load_users()
-    if username not in users:
+    if not username:
+        return False, "User not found"
+    user = _load_user(username)
+    if user is None:
         return False, "User not found"
     
-    user = users[username]
-    if not verify_password(old_password, user["password_hash"]):
+    if not verify_password(old_password, user["password_hash_b"]):
         return False, "Current password is incorrect"
     
-    hashed_password = hash_password(new_password)
-    users[username]["password_hash"] = hashed_password
-    save_users(users)
+    if not _update_user_fields(username, {"password_hash": hash_password(new_password)}):
+        return False, "Failed to change password"
+    # Decrypted key material should not outlive the old password in this session
+    st.session_state.pop("_user_cipher", None)
     return True, "Password changed successfully"
 
 def change_email(username, new_email):
     """Update user's email address."""
-    users = load_users()
-    if username not in users:
+    if not username:
+        return False, "User not found"
+    user = _load_user(username)
+    if user is None:
         return False, "User not found"
     
     if not new_email or "@" not in new_email:
         return False, "Invalid email format"
     
-    users[username]["email"] = new_email
-    save_users(users)
+    if not _update_user_fields(username, {"email": new_email}):
+        return False, "Failed to update email"
     return True, f"Email updated to {new_email}"
 
 def save_fyers_token(username, access_token):
     """Save user's Fyers access token."""
-    users = load_users()
-    if username not in users or "encrypted_user_key" not in users[username]:
+    if not username:
+        return False, "User not found"
+    user = _load_user(username)
+    if user is None or "encrypted_user_key" not in user:
         return False, "User not found or user has no encryption key."
 
     try:
-        encrypted_user_key = users[username]["encrypted_user_key"]
-        user_key = decrypt_with_master_key(encrypted_user_key)
+        user_cipher = _get_user_cipher(username, user["encrypted_user_key"])
         
         if access_token:
-            encrypted_token = encrypt_user_data(access_token, user_key)
+            encrypted_token = encrypt_user_data(access_token, user_cipher)
         else:
             encrypted_token = None
             
-        users[username]["fyers_token"] = encrypted_token
-        save_users(users)
+        if not _update_user_fields(username, {"fyers_token": encrypted_token}):
+            return False, "Failed to save token"
         return True, "Token saved successfully"
     except Exception as e:
         print(f"Error encrypting or saving token: {e}")
@@ -259,28 +416,31 @@ def save_fyers_token(username, access_token):
 
 def load_fyers_token(username):
     """Load user's Fyers access token."""
-    users = load_users()
-    if username not in users or "encrypted_user_key" not in users[username]:
+    if not username:
+        return None
+    user = _load_user(username)
+    if user is None or "encrypted_user_key" not in user:
         return None
     
-    encrypted_token = users[username].get("fyers_token")
+    encrypted_token = user.get("fyers_token")
     if not encrypted_token:
         return None
 
     try:
-        encrypted_user_key = users[username]["encrypted_user_key"]
-        user_key = decrypt_with_master_key(encrypted_user_key)
-        return decrypt_user_data(encrypted_token, user_key)
+        user_cipher = _get_user_cipher(username, user["encrypted_user_key"])
+        return decrypt_user_data(encrypted_token, user_cipher)
     except Exception as e:
         print(f"Failed to decrypt token for user {username}: {e}")
         return None
 
 def delete_fyers_token(username):
     """Delete user's Fyers access token."""
-    users = load_users()
-    if username not in users:
+    if not username:
+        return False, "User not found"
+    user = _load_user(username)
+    if user is None:
         return False, "User not found"
     
-    users[username]["fyers_token"] = None
-    save_users(users)
+    if not _update_user_fields(username, {"fyers_token": None}):
+        return False, "Failed to delete token"
     return True, "Token deleted successfully"
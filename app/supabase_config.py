@@ -1,19 +1,37 @@
 import os
-from supabase import create_client, Client
+import httpx
+import streamlit as st
+from supabase import create_client, Client, ClientOptions
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 
+@st.cache_resource
 def get_supabase_client() -> Client:
-    """Initialize and return Supabase client."""
+    """Initialize and return a process-wide Supabase client.
+
+    The client shares one keep-alive HTTP/2 connection pool, so repeated
+    queries skip the TCP/TLS handshake.
+    """
     if not SUPABASE_URL or not SUPABASE_KEY:
         raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables must be set")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+    http_client = httpx.Client(
+        http2=True,
+        timeout=10,
+        limits=httpx.Limits(max_keepalive_connections=10)
+    )
+    options = ClientOptions(
+        postgrest_client_timeout=10,
+        storage_client_timeout=10,
+        schema="public",
+        httpx_client=http_client
+    )
+    return create_client(SUPABASE_URL, SUPABASE_KEY, options=options)
 
 def init_supabase_tables():
     """Initialize Supabase tables if they don't exist."""
     client = get_supabase_client()
-    
+
     try:
         client.table("users").select("*").limit(1).execute()
         return True
@@ -1,89 +1,145 @@
 # strategy.py
+import sys
+import time
 from datetime import timedelta
 import pandas as pd
 import numpy as np
-from common.data_downloader import download_data_fyers
+from common._njit import njit, HAVE_NUMBA
+from common.data_downloader import download_data_fyers, client_key, INTERVAL_SECONDS
 from common.indicators import heikin_ashi
-from common.utils import to_local
+from common.utils import to_local, format_trade_history, LRUCache
+
+_MIN_CANDLE_TTL = 5
+# (expires, HA arrays) per (client, ticker, interval)
+_candle_cache = LRUCache(maxsize=64)
+
+@njit(cache=True, nogil=True)
+def _run(entry_mask, ha_close, prev_low, sl_pct, tgt_pct, capital0):
+    """Walk the bars once, entering on entry_mask and exiting below the previous HA low, at target or at stoploss."""
+    n = ha_close.shape[0]
+    signals = np.zeros(n, dtype=np.int64)
+    positions = np.zeros(n, dtype=np.int64)
+    account_values = np.zeros(n)
+    trade_idx = np.empty(n, dtype=np.int64)
+    trade_price = np.empty(n)
+    trade_qty = np.empty(n)
+    trade_value = np.empty(n)
+    k = 0
+
+    capital = capital0
+    position = 0
+    shares = 0.0
+    entry_price = 0.0
+    for i in range(1, n):
+        price = ha_close[i]
+        if position == 0:
+            if entry_mask[i]:
+                entry_price = price
+                quantity = capital / price
+                trade_value[k] = quantity * price
+                capital = 0.0  # fully invested
+                shares = quantity
+                position = 1
+                signals[i] = 1
+                trade_idx[k] = i
+                trade_price[k] = price
+                trade_qty[k] = quantity
+                k += 1
+        elif (price < prev_low[i]
+              or price >= entry_price * (1 + tgt_pct / 100)
+              or price <= entry_price * (1 - sl_pct / 100)):
+            capital = shares * price
+            trade_value[k] = capital
+            trade_qty[k] = shares
+            shares = 0.0
+            position = 0
+            signals[i] = -1
+            trade_idx[k] = i
+            trade_price[k] = price
+            k += 1
+
+        positions[i] = position
+        account_values[i] = shares * price if position == 1 else capital
+
+    return (signals, positions, account_values, trade_idx[:k], trade_price[:k],
+            trade_qty[:k], trade_value[:k], capital, shares)
+
+@njit(cache=True)
+def _metrics(equity, returns):
+    """One pass over the equity curve for max drawdown (as a negative fraction) plus win/loss counts."""
+    peak = -np.inf
+    max_dd = 0.0
+    for i in range(equity.size):
+        if equity[i] > peak:
+            peak = equity[i]
+        dd = (equity[i] - peak) / peak
+        if dd < max_dd:
+            max_dd = dd
+    wins = 0
+    losses = 0
+    for j in range(returns.size):
+        if returns[j] > 0:
+            wins += 1
+        else:
+            losses += 1
+    return max_dd, wins, losses
+
+@njit(cache=True)
+def _cond_values(o, c, l, last_idx, sl_pct, tgt_pct, live_price):
+    """Previous-candle HA open/close/low plus stoploss and target prices around live_price."""
+    return (o[last_idx - 1], c[last_idx - 1], l[last_idx - 1],
+            live_price * (1 - sl_pct / 100), live_price * (1 + tgt_pct / 100))
+
+# Compile ahead of the first backtest/tick when running inside the Streamlit server
+if HAVE_NUMBA and "streamlit" in sys.modules:
+    _run(np.zeros(2, dtype=np.bool_), np.ones(2), np.ones(2), 1.0, 1.0, 1.0)
+    _cond_values(np.ones(2), np.ones(2), np.ones(2), 1, 1.0, 1.0, 1.0)
+    _metrics(np.ones(2), np.ones(2))
+
+def entry_condition(price, prev_open, prev_close):
+    """Entry rule: price above the previous candle's open, and the previous candle was bearish.
+
+    Works elementwise on arrays (the backtest) and on scalars (a live tick).
+    """
+    return (price > prev_open) & (prev_open > prev_close)
+
+def build_entry_mask(ha):
+    """entry_condition per bar, with the bar's HA close as the price."""
+    ha_close = ha['HA_Close'].to_numpy()
+    prev_open = ha['HA_Open'].shift(1).to_numpy()
+    prev_close = ha['HA_Close'].shift(1).to_numpy()
+    # The first bar has no previous candle; NaN comparisons are False
+    return entry_condition(ha_close, prev_open, prev_close)
 
 def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10, initial_capital=10000, interval='1d'):
-    # Download intraday and daily data
+    # Download intraday data; no rule reads daily candles
     data = download_data_fyers(ticker, start_date, end_date, period_days=60, gui_resolution=interval, fyers=fyers)
     if data.empty:
         print("No data found for", ticker)
         return None, None, None, None, None, None
 
-    daily_data = download_data_fyers(ticker, start_date, end_date, period_days=30, gui_resolution="1d", fyers=fyers)
-    
     ha_data = heikin_ashi(data)
-    D_Data = heikin_ashi(daily_data)
-    print("Daily HA data head:")
-    print(D_Data.head())
     print(ha_data.tail())
 
-    # Prepare signals and positions
-    ha_data['Signal'] = 0
-    ha_data['Position'] = 0
+    # Precompute per-bar arrays and the entry rule once instead of per row
+    index = ha_data.index
+    ha_close = ha_data['HA_Close'].to_numpy()
+    prev_low = np.roll(ha_data['HA_Low'].to_numpy(), 1)
+    entry_mask = build_entry_mask(ha_data)
 
-    capital = float(initial_capital)
-    position = 0
-    shares = 0.0
-    entry_price = None
-    trades = []
-    account_value_history = []
-
-    for i in range(1, len(ha_data)):
-        row = ha_data.iloc[i]
-        price = float(row['HA_Close'])
-        date = ha_data.index[i]
-        local_date = to_local(date)
-
-        prev_candle = ha_data.iloc[i - 1]
-        prev_open = float(prev_candle["HA_Open"])
-        prev_close = float(prev_candle["HA_Close"])
-        prev_low = float(prev_candle["HA_Low"])
-
-        # Retrieve previous day's HA Open from daily data
-        yesterday_date = date.date() - timedelta(days=1)
-        daily_row = D_Data[D_Data.index.date == yesterday_date]
-        if not daily_row.empty:
-            yest_ha_open = float(daily_row["HA_Open"].iloc[0])
-        else:
-            yest_ha_open = None
+    signals, positions, account_values, trade_idx, trade_price, trade_qty, trade_value, capital, shares = _run(
+        entry_mask, ha_close, prev_low, float(stoploss), float(target), float(initial_capital)
+    )
+    position = int(positions[-1])
 
-        # Entry Condition (example: current price > previous candle open and candle was bearish)
-        if position == 0:
-            # Skip the yest_ha_open check if it's None (yest_ha_open is None or price > yest_ha_open) and 
-            if (price > prev_open) and (prev_open > prev_close):
-                entry_price = price
-                quantity =  capital/price  # Example fixed quantity; change this to accept user-qty from gui_trade.py 
-                trade_cost = quantity * price
-                capital = 0  # fully invested
-                shares = quantity
-                position = 1
-                ha_data.at[date, 'Signal'] = 1
-                trades.append((local_date, local_date.strftime("%H:%M"), "BUY", price, quantity, trade_cost))
-        else:
-            exit_condition = False
-            if price < prev_low:
-                exit_condition = True
-            elif price >= entry_price * (1 + target / 100):
-                exit_condition = True
-            elif price <= entry_price * (1 - stoploss / 100):
-                exit_condition = True
-
-            if exit_condition:
-                trade_value = shares * price
-                capital = trade_value
-                quantity = shares
-                shares = 0.0
-                position = 0
-                ha_data.at[date, 'Signal'] = -1
-                trades.append((local_date, local_date.strftime("%H:%M"), "SELL", price, quantity, trade_value))
-                
-        ha_data.at[date, 'Position'] = position
-        current_value = shares * price if position == 1 else capital
-        account_value_history.append((date, current_value))
+    trades = []
+    for k in range(len(trade_idx)):
+        local_date = to_local(index[trade_idx[k]])
+        side = "BUY" if signals[trade_idx[k]] == 1 else "SELL"
+        trades.append((local_date, local_date.strftime("%H:%M"), side, float(trade_price[k]), float(trade_qty[k]), float(trade_value[k])))
+    account_value_history = list(zip(index[1:], account_values[1:].tolist()))
+    trade_prices = trade_price
+    trade_is_buy = signals[trade_idx] == 1
 
     # Close any open position at the end
     if position == 1:
@@ -93,11 +149,16 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
         trade_value = shares * last_price
         capital += trade_value
         trades.append((local_last_date, local_last_date.strftime("%H:%M"), "SELL", last_price, shares, trade_value))
-        ha_data.at[last_date, 'Signal'] = -1
-        ha_data.at[last_date, 'Position'] = 0
+        signals[-1] = -1
+        positions[-1] = 0
         account_value_history.append((last_date, capital))
+        trade_prices = np.append(trade_prices, last_price)
+        trade_is_buy = np.append(trade_is_buy, False)
         position = 0
 
+    ha_data['Signal'] = signals
+    ha_data['Position'] = positions
+
     total_return = (capital - initial_capital) / initial_capital * 100
     print(f"Initial Capital: ${initial_capital:.2f}")
     print(f"Final Capital: ${capital:.2f}")
@@ -110,35 +171,27 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
 
     account_df = pd.DataFrame(account_value_history, columns=['Date', 'AccountValue'])
     account_df.set_index('Date', inplace=True)
-    running_max = account_df['AccountValue'].cummax()
-    drawdown = (account_df['AccountValue'] - running_max) / running_max
-    max_drawdown = drawdown.min() * 100
-    print(f"Maximum Drawdown: {max_drawdown:.2f}%")
 
     # Compute trade return metrics
-    trade_returns = []
-    open_buy_price = None
-    for trade in trades:
-        if trade[2] == "BUY":
-            open_buy_price = trade[3]
-        elif trade[2] == "SELL" and open_buy_price is not None:
-            ret = (trade[3] / open_buy_price - 1) * 100
-            trade_returns.append(ret)
-            open_buy_price = None
+    # Trades alternate BUY/SELL, so the n-th SELL closes the n-th BUY
+    buys = trade_prices[trade_is_buy]
+    sells = trade_prices[~trade_is_buy]
+    pairs = min(len(buys), len(sells))
+    trade_returns = (sells[:pairs] / buys[:pairs] - 1) * 100
+
+    max_drawdown, winning_trades, losing_trades = _metrics(
+        account_df['AccountValue'].to_numpy(dtype=np.float64), trade_returns
+    )
+    max_drawdown *= 100
+    print(f"Maximum Drawdown: {max_drawdown:.2f}%")
 
     num_trades = len(trade_returns)
-    winning_trades = sum(1 for r in trade_returns if r > 0)
-    losing_trades = sum(1 for r in trade_returns if r <= 0)
     win_rate = (winning_trades / num_trades * 100) if num_trades > 0 else 0
-    avg_trade_return = np.mean(trade_returns) if trade_returns else 0
+    avg_trade_return = trade_returns.mean() if num_trades else 0
 
     trade_history_df = pd.DataFrame(trades, columns=['Date', 'Hour', 'Signal', 'Price', 'Quantity', 'Value'])
-    trade_history_df['Date'] = pd.to_datetime(trade_history_df['Date']).dt.strftime("%d-%b-%Y")
-    trade_history_df['Price'] = trade_history_df['Price'].round(2)
-    trade_history_df['Quantity'] = trade_history_df['Quantity'].round(4)
-    trade_history_df['Value'] = trade_history_df['Value'].round(2)
     print("\nTrade History:")
-    print(trade_history_df.to_string(index=False))
+    print(format_trade_history(trade_history_df).to_string(index=False))
 
     # Return data, trade history, performance summaries, and the account DataFrame
     perf_summary = {
@@ -158,40 +211,44 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
     return ha_data, trades, perf_summary, perf_metrics, trade_history_df, account_df
 
 
-def should_enter_trade(fyers, ticker, live_price, interval="1m"):
+def _recent_arrays(fyers, ticker, interval):
+    """(HA_Open, HA_Close, HA_Low) arrays for the last two days, re-downloaded only after the current bar has closed."""
+    key = (client_key(fyers), ticker, interval)
+    now = time.time()
+    cached = _candle_cache.get(key)
+    if cached and now < cached[0]:
+        return cached[1]
+
     from datetime import datetime, timedelta
-    # Download recent historical data to compute previous candle's HA values.
     start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
     end_date = datetime.now().strftime("%Y-%m-%d")
     df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
     if df is None or len(df) < 2:
+        arrays = None
+        expires = now + _MIN_CANDLE_TTL
+    else:
+        ha_df = heikin_ashi(df)
+        # Flat HA open/close/low buffers for the per-tick condition kernel
+        arrays = tuple(np.ascontiguousarray(ha_df[col].to_numpy(), dtype=np.float64) for col in ('HA_Open', 'HA_Close', 'HA_Low'))
+        # The last candle is the one still forming; keep it until its bar rolls over
+        bar_close = ha_df.index[-1].timestamp() + INTERVAL_SECONDS.get(interval, 60)
+        expires = max(bar_close, now + _MIN_CANDLE_TTL)
+    _candle_cache[key] = (expires, arrays)
+    return arrays
+
+def should_enter_trade(fyers, ticker, live_price, interval="1m"):
+    arrays = _recent_arrays(fyers, ticker, interval)
+    if arrays is None:
         return False
-    ha_df = heikin_ashi(df)
-    if len(ha_df) < 2:
-        return False
-    # Use the previous candle from the HA calculations.
-    prev_candle = ha_df.iloc[-2]
-    prev_open = prev_candle['HA_Open']
-    prev_close = prev_candle['HA_Close']
-    
-    # Use the passed-in live_price instead of curr_candle['HA_Close']
-    if (prev_open > prev_close) and (live_price > prev_open):
-        return True
-    return False
+    # Use the previous candle from the HA calculations, with the live price in place of the current HA close
+    ha_open, ha_close, _ = arrays
+    return bool(entry_condition(live_price, ha_open[-2], ha_close[-2]))
 
 def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price, interval="1m"):
-    from datetime import datetime, timedelta
-    # Download recent historical data to compute previous candle's HA values.
-    start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
-    if df is None or len(df) < 2:
+    arrays = _recent_arrays(fyers, ticker, interval)
+    if arrays is None:
         return False
-    ha_df = heikin_ashi(df)
-    if len(ha_df) < 2:
-        return False
-    prev_candle = ha_df.iloc[-2]
-    prev_low = prev_candle['HA_Low']
+    prev_low = arrays[2][-2]
     
     # Use the live_price for checks.
     if live_price < prev_low:
@@ -209,12 +266,8 @@ def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price,
 
 def get_condition_values(fyers, ticker, live_price, interval, stoploss, target):
     """Get all condition values for display in GUI"""
-    from datetime import datetime, timedelta
-    # Download recent historical data
-    start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
-    if df is None or len(df) < 2:
+    arrays = _recent_arrays(fyers, ticker, interval)
+    if arrays is None:
         return {
             'prev_open': 0,
             'prev_close': 0,
@@ -223,25 +276,10 @@ def get_condition_values(fyers, ticker, live_price, interval, stoploss, target):
             'target_price': 0
         }
     
-    ha_df = heikin_ashi(df)
-    if len(ha_df) < 2:
-        return {
-            'prev_open': 0,
-            'prev_close': 0,
-            'prev_low': 0,
-            'stoploss_price': 0,
-            'target_price': 0
-        }
-    
-    # Get values from previous candle
-    prev_candle = ha_df.iloc[-2]
-    prev_open = float(prev_candle['HA_Open'])
-    prev_close = float(prev_candle['HA_Close'])
-    prev_low = float(prev_candle['HA_Low'])
-    
-    # Calculate stoploss and target prices
-    stoploss_price = live_price * (1 - stoploss / 100)
-    target_price = live_price * (1 + target / 100)
+    ha_open, ha_close, ha_low = arrays
+    prev_open, prev_close, prev_low, stoploss_price, target_price = _cond_values(
+        ha_open, ha_close, ha_low, ha_close.shape[0] - 1, float(stoploss), float(target), float(live_price)
+    )
     
     return {
         'prev_open': prev_open,
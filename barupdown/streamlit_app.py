@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import time
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
 from datetime import datetime, timedelta
 import sys
 import os
@@ -10,36 +13,288 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from common.data_downloader import download_data_fyers
-from common.indicators import heikin_ashi
-from common.utils import to_local, get_download_path, export_to_excel
+from common.data_downloader import get_latest_price, INTERVAL_SECONDS
+from common.utils import format_trade_history
 from barupdown.Hr_strategy import backtest_strategy, should_enter_trade, should_exit_trade, get_condition_values
+from fyers_apiv3.FyersWebsocket import data_ws
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+TRADE_LOG_MAXLEN = 1000
+TRADE_LOG_DTYPES = {
+    "Timestamp": "string[pyarrow]",
+    "Signal": "string[pyarrow]",
+    "Price": "double[pyarrow]",
+    "Quantity": "int64[pyarrow]",
+    "PnL": "double[pyarrow]",
+}
+
+_BU_DEFAULTS = (
+    ('barupdown_position', 0),
+    ('barupdown_entry_price', None),
+    ('barupdown_entry_time', None),
+    ('barupdown_qty', 0),
+    ('barupdown_running', False),
+)
 
 def initialize_trading_state():
-    if 'barupdown_position' not in st.session_state:
-        st.session_state.barupdown_position = 0
-    if 'barupdown_entry_price' not in st.session_state:
-        st.session_state.barupdown_entry_price = None
-    if 'barupdown_entry_time' not in st.session_state:
-        st.session_state.barupdown_entry_time = None
-    if 'barupdown_qty' not in st.session_state:
-        st.session_state.barupdown_qty = 0
+    for key, value in _BU_DEFAULTS:
+        st.session_state.setdefault(key, value)
+    # Each session gets its own log, bounded so long sessions stay small
     if 'barupdown_trade_log' not in st.session_state:
-        st.session_state.barupdown_trade_log = []
-    if 'barupdown_running' not in st.session_state:
-        st.session_state.barupdown_running = False
+        st.session_state.barupdown_trade_log = deque(maxlen=TRADE_LOG_MAXLEN)
 
-def get_latest_price(fyers, ticker):
-    try:
-        response = fyers.quotes({"symbols": ticker})
-        if (response and "d" in response and len(response["d"]) > 0 and 
-            "v" in response["d"][0] and "lp" in response["d"][0]["v"]):
-            price = float(response["d"][0]["v"]["lp"])
-            if price > 0:
-                return price
+UNCHANGED_TICK_SECONDS = 5
+
+STALE_TICK_SECONDS = 5
+
+class _PriceFeed:
+    """The process's one Fyers websocket, shared by every session.
+
+    FyersDataSocket is a singleton, so it can only hold one access token: it subscribes the
+    union of the sessions' symbols and fans each tick out to the queues of the sessions
+    following that symbol. Sessions on another token are turned away and use REST quotes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.header = None
+        self.socket = None
+        self.connected = False
+        # Socket calls run here, in order, off the script threads (close_connection joins threads)
+        self.worker = ThreadPoolExecutor(max_workers=1)
+
+    def _symbols(self):
+        return {symbol for symbol, _ in self.sessions.values()}
+
+    def _prune(self):
+        """Forget sessions whose browser went away without stopping."""
+        if runtime.exists():
+            for session_id in [s for s in self.sessions if not runtime.get_instance().is_active_session(s)]:
+                del self.sessions[session_id]
+
+    def join(self, session_id, header, symbol):
+        """Follow symbol for session_id; returns its tick queue, or None if the feed runs on another token."""
+        with self.lock:
+            self._prune()
+            before = self._symbols()
+            self.sessions.pop(session_id, None)
+            if self.header not in (None, header) and self.sessions:
+                self.worker.submit(self._resubscribe, before - self._symbols(), set())
+                return None
+            ticks = queue.Queue(maxsize=1000)
+            self.sessions[session_id] = (symbol, ticks)
+            if header != self.header:
+                self.header = header
+                self.worker.submit(self._open, header)
+            else:
+                after = self._symbols()
+                self.worker.submit(self._resubscribe, before - after, after - before)
+            return ticks
+
+    def leave(self, session_id):
+        """Stop feeding session_id; the socket closes once no session is left."""
+        with self.lock:
+            before = self._symbols()
+            if self.sessions.pop(session_id, None) is None:
+                return
+            if not self.sessions:
+                self.header = None
+                self.worker.submit(self._close)
+            else:
+                self.worker.submit(self._resubscribe, before - self._symbols(), set())
+
+    def _open(self, header):
+        self._close()
+        self.socket = data_ws.FyersDataSocket(
+            access_token=header,
+            log_path="",
+            litemode=True,
+            write_to_file=False,
+            reconnect=True,
+            on_connect=self._on_connect,
+            on_close=self._on_close,
+            on_error=self._on_error,
+            on_message=self._on_message
+        )
+        self.socket.connect()
+
+    def _close(self):
+        self.connected = False
+        if self.socket is not None:
+            self.socket.close_connection()
+            self.socket = None
+
+    def _resubscribe(self, removed, added):
+        if not self.connected or self.socket is None:
+            return  # _on_connect subscribes whatever is followed by then
+        if removed:
+            self.socket.unsubscribe(symbols=list(removed), data_type="SymbolUpdate")
+        if added:
+            self.socket.subscribe(symbols=list(added), data_type="SymbolUpdate")
+
+    def _on_connect(self):
+        self.connected = True
+        with self.lock:
+            symbols = list(self._symbols())
+        if symbols:
+            self.socket.subscribe(symbols=symbols, data_type="SymbolUpdate")
+
+    def _on_close(self, msg):
+        self.connected = False
+
+    def _on_error(self, msg):
+        print("Websocket error:", msg)
+        self.connected = False
+
+    def _on_message(self, msg):
+        if not (isinstance(msg, dict) and "ltp" in msg):
+            return
+        tick = (msg.get("symbol"), float(msg["ltp"]), time.time())
+        with self.lock:
+            queues = [ticks for symbol, ticks in self.sessions.values() if symbol == tick[0]]
+        for ticks in queues:
+            try:
+                ticks.put_nowait(tick)
+            except queue.Full:
+                pass
+
+@st.cache_resource
+def _price_feed():
+    """The process-wide price feed."""
+    return _PriceFeed()
+
+def _session_id():
+    return get_script_run_ctx().session_id
+
+def stop_price_stream():
+    """Stop following prices for this session; the shared socket closes when no session is left."""
+    if st.session_state.pop("bu_ws", None) is not None:
+        _price_feed().leave(_session_id())
+
+def start_price_stream(fyers, symbol):
+    """Follow symbol on the shared feed; None while the feed runs on another user's token."""
+    stream = st.session_state.get("bu_ws")
+    if stream is not None and stream["symbol"] == symbol and stream["header"] == fyers.header:
+        return stream
+    ticks = _price_feed().join(_session_id(), fyers.header, symbol)
+    if ticks is None:
+        st.session_state.pop("bu_ws", None)
         return None
+    stream = st.session_state.bu_ws = {"queue": ticks, "symbol": symbol, "header": fyers.header, "last": None}
+    return stream
+
+def next_price(fyers, symbol, stream, timeout=0.5):
+    """Return the newest streamed price for symbol, falling back to a REST quote when the feed is down or stale."""
+    if stream is None:
+        return get_latest_price(fyers, symbol)
+    connected = _price_feed().connected
+    try:
+        if stream["queue"].empty() and connected:
+            stream["last"] = stream["queue"].get(timeout=timeout)
+        while True:
+            stream["last"] = stream["queue"].get_nowait()
+    except queue.Empty:
+        pass
+    last = stream["last"]
+    if connected and last is not None and last[0] == symbol and time.time() - last[2] <= STALE_TICK_SECONDS:
+        return last[1]
+    return get_latest_price(fyers, symbol)
+
+@st.fragment(run_every="1s")
+def _tick_fragment(symbol, interval, stoploss, target, qty, trading_mode):
+    """One trading tick: read the newest price, apply the entry/exit rules and redraw the status panel."""
+    if not st.session_state.barupdown_running:
+        return
+    fyers = st.session_state.fyers_client
+    trading_status = "Running (LIVE)" if trading_mode == "Live Trade" else "Running (PAPER)"
+
+    try:
+        price = next_price(fyers, symbol, start_price_stream(fyers, symbol))
+        if price is None:
+            with st.container():
+                st.info(f"Status: {trading_status}")
+                st.warning("Waiting for valid market data...")
+            return
+
+        # Same price, same bar and same settings as a recent tick: nothing can have changed
+        tick_key = (symbol, interval, stoploss, target, qty, price, st.session_state.barupdown_position,
+                    int(time.time() // INTERVAL_SECONDS.get(interval, 60)))
+        last_tick = st.session_state.get("bu_last_tick")
+        if last_tick and last_tick[0] == tick_key and time.time() - last_tick[1] < UNCHANGED_TICK_SECONDS:
+            status, conditions = last_tick[2], last_tick[3]
+        else:
+            now_dt = datetime.now()
+            now = now_dt.strftime("%H:%M:%S")
+            dt = now_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+            if st.session_state.barupdown_position == 0:
+                if should_enter_trade(fyers, symbol, price, interval):
+                    st.session_state.barupdown_entry_price = price
+                    st.session_state.barupdown_entry_time = now
+                    st.session_state.barupdown_qty = qty
+                    st.session_state.barupdown_position = 1
+                    st.session_state.barupdown_trade_log.append([dt, "BUY", price, qty, 0.0])
+                    status = ("success", f"BUY executed at ₹{price:.2f}")
+                else:
+                    status = ("info", "Waiting for entry signal...")
+            elif should_exit_trade(fyers, symbol, st.session_state.barupdown_entry_price, stoploss, target, price, interval):
+                pnl = (price - st.session_state.barupdown_entry_price) * qty
+                st.session_state.barupdown_trade_log.append([dt, "SELL", price, qty, round(pnl, 2)])
+                st.session_state.bu_last_exit = (
+                    f"SELL executed at ₹{price:.2f} | P&L: ₹{pnl:.2f} "
+                    f"({((pnl / (st.session_state.barupdown_entry_price * qty)) * 100):.2f}%)"
+                )
+                st.session_state.barupdown_position = 0
+                st.session_state.barupdown_entry_price = None
+                st.session_state.barupdown_entry_time = None
+                st.session_state.barupdown_running = False
+                stop_price_stream()
+                st.rerun()
+            else:
+                status = ("info", f"Status: {trading_status}")
+
+            conditions = get_condition_values(fyers, symbol, price, interval, stoploss, target)
+            st.session_state.bu_last_tick = (tick_key, time.time(), status, conditions)
     except Exception as e:
-        return None
+        st.error(f"Error: {e}")
+        return
+
+    # Render the whole panel in one container so it updates as a unit
+    with st.container():
+        getattr(st, status[0])(status[1])
+        st.metric("Current Price", f"₹{price:.2f}")
+        if st.session_state.barupdown_position == 1:
+            entry_price = st.session_state.barupdown_entry_price
+            current_pnl = (price - entry_price) * qty
+            st.metric("Entry Price", f"₹{entry_price:.2f}", delta=f"@ {st.session_state.barupdown_entry_time}")
+            st.metric("Current P&L", f"₹{current_pnl:.2f}", delta=f"{((current_pnl / (entry_price * qty)) * 100):.2f}%")
+
+        st.markdown("#### Condition Values")
+        cond_col1, cond_col2 = st.columns(2)
+        with cond_col1:
+            st.write(f"Prev Open: ₹{conditions['prev_open']:.2f}")
+            st.write(f"Prev Close: ₹{conditions['prev_close']:.2f}")
+            st.write(f"Prev Low: ₹{conditions['prev_low']:.2f}")
+        with cond_col2:
+            st.write(f"SL Price: ₹{conditions['stoploss_price']:.2f}")
+            st.write(f"Target Price: ₹{conditions['target_price']:.2f}")
+
+def _start_trading():
+    st.session_state.barupdown_running = True
+
+def _stop_trading(symbol):
+    """Stop-button callback; runs before the rerun so no further tick is processed."""
+    st.session_state.barupdown_running = False
+    stop_price_stream()
+    if st.session_state.barupdown_position == 1:
+        price = get_latest_price(st.session_state.fyers_client, symbol)
+        if price:
+            dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            pnl = (price - st.session_state.barupdown_entry_price) * st.session_state.barupdown_qty
+            st.session_state.barupdown_trade_log.append([dt, "SELL", price, st.session_state.barupdown_qty, round(pnl, 2)])
+            st.session_state.barupdown_position = 0
 
 def show_barupdown():
     st.subheader("Bar Up Down Strategy")
@@ -63,117 +318,27 @@ def show_barupdown():
     
     with col2:
         st.markdown("### Current Status")
-        status_placeholder = st.empty()
-        price_placeholder = st.empty()
-        entry_placeholder = st.empty()
-        pnl_placeholder = st.empty()
-        
-        conditions_placeholder = st.empty()
+        if st.session_state.barupdown_running:
+            _tick_fragment(symbol.upper(), interval, stoploss, target, qty, trading_mode)
     
     if st.session_state.barupdown_running:
-        st.session_state.barupdown_running = True
-        
-        if st.button("Stop Trading", key="bu_stop"):
-            st.session_state.barupdown_running = False
-            if st.session_state.barupdown_position == 1:
-                price = get_latest_price(st.session_state.fyers_client, symbol.upper())
-                if price:
-                    dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    pnl = (price - st.session_state.barupdown_entry_price) * st.session_state.barupdown_qty
-                    st.session_state.barupdown_trade_log.append([dt, "SELL", price, st.session_state.barupdown_qty, round(pnl, 2)])
-                    st.session_state.barupdown_position = 0
-            st.rerun()
-        
-        trading_status = "Running"
-        if trading_mode == "Live Trade":
-            trading_status += " (LIVE)"
-        else:
-            trading_status += " (PAPER)"
-        
-        status_placeholder.info(f"Status: {trading_status}")
-        
-        progress_bar = st.progress(0)
-        update_count = 0
-        max_updates = 60
-        
-        while st.session_state.barupdown_running and update_count < max_updates:
-            try:
-                price = get_latest_price(st.session_state.fyers_client, symbol.upper())
-                
-                if price is None:
-                    status_placeholder.warning("Waiting for valid market data...")
-                    time.sleep(1)
-                    update_count += 1
-                    progress_bar.progress(min(update_count / max_updates, 0.99))
-                    continue
-                
-                now = datetime.now().strftime("%H:%M:%S")
-                dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                price_placeholder.metric("Current Price", f"₹{price:.2f}")
-                
-                if st.session_state.barupdown_position == 0:
-                    if should_enter_trade(st.session_state.fyers_client, symbol.upper(), price, interval):
-                        st.session_state.barupdown_entry_price = price
-                        st.session_state.barupdown_entry_time = now
-                        st.session_state.barupdown_qty = qty
-                        st.session_state.barupdown_position = 1
-                        st.session_state.barupdown_trade_log.append([dt, "BUY", price, qty, 0.0])
-                        status_placeholder.success(f"BUY executed at ₹{price:.2f}")
-                        entry_placeholder.metric("Entry Price", f"₹{st.session_state.barupdown_entry_price:.2f}", delta=f"@ {st.session_state.barupdown_entry_time}")
-                    else:
-                        status_placeholder.info("Waiting for entry signal...")
-                else:
-                    if should_exit_trade(st.session_state.fyers_client, symbol.upper(), st.session_state.barupdown_entry_price, stoploss, target, price, interval):
-                        pnl = (price - st.session_state.barupdown_entry_price) * qty
-                        st.session_state.barupdown_trade_log.append([dt, "SELL", price, qty, round(pnl, 2)])
-                        pnl_placeholder.metric("P&L", f"₹{pnl:.2f}", delta=f"{((pnl / (st.session_state.barupdown_entry_price * qty)) * 100):.2f}%")
-                        status_placeholder.success(f"SELL executed at ₹{price:.2f} | P&L: ₹{pnl:.2f}")
-                        st.session_state.barupdown_position = 0
-                        st.session_state.barupdown_entry_price = None
-                        st.session_state.barupdown_entry_time = None
-                        st.session_state.barupdown_running = False
-                        st.info("Exit triggered. Trading stopped.")
-                        break
-                    else:
-                        entry_placeholder.metric("Entry Price", f"₹{st.session_state.barupdown_entry_price:.2f}", delta=f"@ {st.session_state.barupdown_entry_time}")
-                        if st.session_state.barupdown_position == 1:
-                            current_pnl = (price - st.session_state.barupdown_entry_price) * qty
-                            pnl_placeholder.metric("Current P&L", f"₹{current_pnl:.2f}", delta=f"{((current_pnl / (st.session_state.barupdown_entry_price * qty)) * 100):.2f}%")
-                
-                conditions = get_condition_values(st.session_state.fyers_client, symbol.upper(), price, interval, stoploss, target)
-                with conditions_placeholder.container():
-                    st.markdown("#### Condition Values")
-                    cond_col1, cond_col2 = st.columns(2)
-                    with cond_col1:
-                        st.write(f"Prev Open: ₹{conditions['prev_open']:.2f}")
-                        st.write(f"Prev Close: ₹{conditions['prev_close']:.2f}")
-                        st.write(f"Prev Low: ₹{conditions['prev_low']:.2f}")
-                    with cond_col2:
-                        st.write(f"SL Price: ₹{conditions['stoploss_price']:.2f}")
-                        st.write(f"Target Price: ₹{conditions['target_price']:.2f}")
-                
-                time.sleep(1)
-                update_count += 1
-                progress_bar.progress(min(update_count / max_updates, 0.99))
-            
-            except Exception as e:
-                status_placeholder.error(f"Error: {e}")
-                break
-        
-        progress_bar.empty()
+        st.button("Stop Trading", key="bu_stop", on_click=_stop_trading, args=(symbol.upper(),))
     else:
-        if st.button("Start Trading", key="bu_start"):
-            st.session_state.barupdown_running = True
-            st.rerun()
+        last_exit = st.session_state.pop("bu_last_exit", None)
+        if last_exit:
+            st.success(last_exit)
+            st.info("Exit triggered. Trading stopped.")
+
+        st.button("Start Trading", key="bu_start", on_click=_start_trading)
         
         # Add a section to view and download the trade log
         if st.session_state.barupdown_trade_log:
             st.markdown("### Session Trade Log")
+            # Arrow-backed columns: compact strings and a zero-copy hand-off to the frontend
             log_df = pd.DataFrame(
-                st.session_state.barupdown_trade_log,
-                columns=["Timestamp", "Signal", "Price", "Quantity", "PnL"]
-            )
+                list(st.session_state.barupdown_trade_log),
+                columns=list(TRADE_LOG_DTYPES)
+            ).astype(TRADE_LOG_DTYPES)
             st.dataframe(log_df)
 
 
@@ -233,31 +398,44 @@ def show_backtest():
                     st.metric("Win Rate", f"{perf_metrics['Win Rate']:.2f}%")
                 
                 st.markdown("### Trade History")
-                st.dataframe(trade_history_df, width='stretch')
+                st.dataframe(format_trade_history(trade_history_df), width='stretch')
                 
                 st.markdown("### Backtest Chart")
                 
+                # plotly is only needed for this chart; importing here keeps it off every page load
+                import plotly.graph_objects as go
+                from plotly.subplots import make_subplots
+
+                # Extract both signal sets in one pass over plain arrays
+                sig = ha_data['Signal'].to_numpy()
+                hac = ha_data['HA_Close'].to_numpy()
+                idx = ha_data.index
+                # Signal positions found once and reused for both the x and y of each marker trace
+                buy_pos = np.flatnonzero(sig == 1)
+                sell_pos = np.flatnonzero(sig == -1)
+                # WebGL traces keep very long intraday backtests responsive
+                line_trace = go.Scattergl if len(idx) > 50000 else go.Scatter
+
                 # Create figure with secondary y-axis
                 fig = make_subplots(specs=[[{"secondary_y": True}]])
 
                 # Add Equity Curve (Price)
                 fig.add_trace(
-                    go.Scatter(x=ha_data.index, y=ha_data['HA_Close'], name="Price (HA Close)", line=dict(color='black')),
+                    line_trace(x=idx, y=hac, name="Price (HA Close)", line=dict(color='black')),
                     secondary_y=False,
                 )
 
                 # Add Account Value Curve
                 fig.add_trace(
-                    go.Scatter(x=account_df.index, y=account_df['AccountValue'], name="Account Value", line=dict(color='blue', dash='dash')),
+                    line_trace(x=account_df.index, y=account_df['AccountValue'].to_numpy(), name="Account Value", line=dict(color='blue', dash='dash')),
                     secondary_y=True,
                 )
 
                 # Add Buy Signals
-                buy_signals = ha_data[ha_data['Signal'] == 1]
                 fig.add_trace(
                     go.Scatter(
-                        x=buy_signals.index, 
-                        y=buy_signals['HA_Close'], 
+                        x=idx[buy_pos], 
+                        y=hac[buy_pos], 
                         name='Buy Signal', 
                         mode='markers', 
                         marker=dict(symbol='triangle-up', color='green', size=10)
@@ -266,11 +444,10 @@ def show_backtest():
                 )
 
                 # Add Sell Signals
-                sell_signals = ha_data[ha_data['Signal'] == -1]
                 fig.add_trace(
                     go.Scatter(
-                        x=sell_signals.index, 
-                        y=sell_signals['HA_Close'], 
+                        x=idx[sell_pos], 
+                        y=hac[sell_pos], 
                         name='Sell Signal', 
                         mode='markers', 
                         marker=dict(symbol='triangle-down', color='red', size=10)
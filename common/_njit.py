@@ -0,0 +1,17 @@
+# _njit.py
+# numba is optional: without it the kernels below run as plain Python (slower, same results).
+try:
+    from numba import njit as _numba_njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    _numba_njit = None
+    prange = range
+    HAVE_NUMBA = False
+
+def njit(*args, **kwargs):
+    """numba.njit when numba is installed, otherwise a no-op; usable bare or with arguments."""
+    if _numba_njit is not None:
+        return _numba_njit(*args, **kwargs)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
@@ -0,0 +1,248 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from typing import Optional, List, Dict, Tuple
+
+# (increasing, decreasing, outline) candle colours for each supported style; outline None means the fill colour
+STYLE_COLORS = {
+    'charles': ('#26a69a', '#ef5350', None),
+    'yahoo': ('#0066cc', '#ef5350', None),
+    'classic': ('#ffffff', '#000000', '#000000'),
+}
+
+class ChartManager:
+    def __init__(self, style: str = 'charles'):
+        """
+        Initialize the ChartManager with a default style.
+        
+        Args:
+            style (str): The style to use for the chart. Options include:
+                - 'charles' (default): Green/red candlesticks
+                - 'yahoo': Blue/red candlesticks
+                - 'classic': Black/white candlesticks
+        """
+        self.style = style
+        self.default_figsize = (12, 8)
+        self.current_fig = None
+        
+    def plot_candlestick(self, 
+                        df: pd.DataFrame,
+                        title: str = "Price Chart",
+                        volume: bool = True,
+                        indicators: Optional[Dict[str, pd.Series]] = None,
+                        save_path: Optional[str] = None,
+                        figsize: Optional[Tuple[int, int]] = None,
+                        returnfig: bool = False,
+                        update_only: bool = False) -> Optional[go.Figure]:
+        """
+        Create a candlestick chart with optional volume and indicators.
+        
+        Args:
+            df (pd.DataFrame): DataFrame with OHLCV data and datetime index
+            title (str): Chart title
+            volume (bool): Whether to show volume
+            indicators (Dict[str, pd.Series]): Dictionary of indicator names and their Series
+            save_path (str): Path to save the chart as HTML
+            figsize (Tuple[int, int]): Figure size in inches (width, height)
+            returnfig (bool): Whether to return the figure instead of showing the plot
+            update_only (bool): If True, replace the data of the existing traces in place instead of building a new figure
+            
+        Returns:
+            Optional[go.Figure]: If returnfig is True, returns the figure
+        """
+        if figsize is None:
+            figsize = self.default_figsize
+
+        if update_only and self.current_fig is not None:
+            fig = self.current_fig
+            with fig.batch_update():
+                fig.data[0].update(x=df.index, open=df['open'], high=df['high'], low=df['low'], close=df['close'])
+                for trace in fig.data[1:]:
+                    if trace.name == 'Volume' and 'volume' in df:
+                        trace.update(x=df.index, y=df['volume'])
+                    elif indicators and trace.name in indicators:
+                        trace.update(x=indicators[trace.name].index, y=indicators[trace.name])
+                fig.layout.title.text = title
+            return fig if returnfig else None
+
+        show_volume = volume and 'volume' in df
+        if show_volume:
+            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.75, 0.25], vertical_spacing=0.03)
+        else:
+            fig = make_subplots(rows=1, cols=1)
+
+        increasing, decreasing, outline = STYLE_COLORS.get(self.style, STYLE_COLORS['charles'])
+        fig.add_trace(
+            go.Candlestick(
+                x=df.index, open=df['open'], high=df['high'], low=df['low'], close=df['close'],
+                name='Price',
+                increasing_line_color=outline or increasing,
+                increasing_fillcolor=increasing,
+                decreasing_line_color=outline or decreasing,
+                decreasing_fillcolor=decreasing
+            ),
+            row=1, col=1
+        )
+        if show_volume:
+            fig.add_trace(go.Bar(x=df.index, y=df['volume'], name='Volume', marker_color='gray'), row=2, col=1)
+
+        # Add indicators if provided
+        if indicators:
+            for name, series in indicators.items():
+                if not series.empty and not series.isna().all():
+                    fig.add_trace(go.Scattergl(x=series.index, y=series, name=name, mode='lines'), row=1, col=1)
+
+        fig.update_layout(
+            title_text=title,
+            width=int(figsize[0] * 100),
+            height=int(figsize[1] * 100),
+            margin=dict(l=20, r=20, t=50, b=20),
+            xaxis_rangeslider_visible=False,
+            uirevision='keep'
+        )
+        # Configure grid for all axes
+        fig.update_xaxes(showgrid=True, griddash='dash', gridcolor='rgba(128,128,128,0.3)')
+        fig.update_yaxes(showgrid=True, griddash='dash', gridcolor='rgba(128,128,128,0.3)')
+
+        # Store current figure for updates
+        self.current_fig = fig
+
+        return self._finish(fig, save_path, returnfig)
+
+    def append_candle(self, o: float, h: float, l: float, c: float, t, v: Optional[float] = None) -> Optional[go.Figure]:
+        """
+        Append one candle to the current figure without rebuilding it.
+        
+        Args:
+            o, h, l, c (float): Open, high, low and close of the new candle
+            t: Candle timestamp
+            v (float): Candle volume, appended to the volume bars when present
+            
+        Returns:
+            Optional[go.Figure]: The updated figure, or None if nothing has been plotted yet
+        """
+        fig = self.current_fig
+        if fig is None:
+            return None
+        candles = fig.data[0]
+        with fig.batch_update():
+            candles.x = np.append(candles.x, t)
+            candles.open = np.append(candles.open, o)
+            candles.high = np.append(candles.high, h)
+            candles.low = np.append(candles.low, l)
+            candles.close = np.append(candles.close, c)
+            if v is not None:
+                for trace in fig.data[1:]:
+                    if trace.name == 'Volume':
+                        trace.x = np.append(trace.x, t)
+                        trace.y = np.append(trace.y, v)
+        return fig
+        
+    def plot_backtest_results(self,
+                            df: pd.DataFrame,
+                            trades: List[Dict],
+                            title: str = "Backtest Results",
+                            save_path: Optional[str] = None,
+                            returnfig: bool = False) -> Optional[go.Figure]:
+        """
+        Create a chart showing backtest results with entry/exit points.
+        
+        Args:
+            df (pd.DataFrame): Price data
+            trades (List[Dict]): List of trade dictionaries with keys:
+                - entry_time: datetime
+                - entry_price: float
+                - exit_time: datetime
+                - exit_price: float
+                - pnl: float
+            title (str): Chart title
+            save_path (str): Path to save the chart as HTML
+            returnfig (bool): Whether to return the figure instead of showing the plot
+        """
+        fig = self.plot_candlestick(df, title=title, volume=False, returnfig=True)
+
+        entry_time = [t['entry_time'] for t in trades]
+        entry_price = [t['entry_price'] for t in trades]
+        exit_time = [t['exit_time'] for t in trades]
+        exit_price = [t['exit_price'] for t in trades]
+
+        # One trace per marker type, plus one gap-separated trace for all entry-exit lines
+        fig.add_trace(go.Scatter(x=entry_time, y=entry_price, name='Entry', mode='markers',
+                                 marker=dict(symbol='triangle-up', color='green', size=10)))
+        fig.add_trace(go.Scatter(x=exit_time, y=exit_price, name='Exit', mode='markers',
+                                 marker=dict(symbol='triangle-down', color='red', size=10)))
+        line_x = [x for t in trades for x in (t['entry_time'], t['exit_time'], None)]
+        line_y = [y for t in trades for y in (t['entry_price'], t['exit_price'], None)]
+        fig.add_trace(go.Scatter(x=line_x, y=line_y, mode='lines', showlegend=False,
+                                 line=dict(color='black', dash='dash'), opacity=0.5))
+
+        return self._finish(fig, save_path, returnfig)
+        
+    def plot_equity_curve(self,
+                         equity_curve: pd.Series,
+                         title: str = "Equity Curve",
+                         save_path: Optional[str] = None,
+                         returnfig: bool = False) -> Optional[go.Figure]:
+        """
+        Create a chart showing the equity curve over time.
+        
+        Args:
+            equity_curve (pd.Series): Series with datetime index and equity values
+            title (str): Chart title
+            save_path (str): Path to save the chart as HTML
+            returnfig (bool): Whether to return the figure instead of showing the plot
+        """
+        fig = go.Figure(go.Scattergl(x=equity_curve.index, y=equity_curve.to_numpy(), mode='lines', name='Equity'))
+        fig.update_layout(
+            title_text=title,
+            xaxis_title='Date',
+            yaxis_title='Equity',
+            width=int(self.default_figsize[0] * 100),
+            height=int(self.default_figsize[1] * 100)
+        )
+        return self._finish(fig, save_path, returnfig)
+
+    def _finish(self, fig: go.Figure, save_path: Optional[str], returnfig: bool) -> Optional[go.Figure]:
+        """Save, then either return or show the figure."""
+        if save_path:
+            # Interactive HTML only: static images would need kaleido (and a Chrome install)
+            fig.write_html(save_path)
+        if returnfig:
+            return fig
+        fig.show()
+        return None
+
+# Example usage:
+if __name__ == "__main__":
+    from common.data_downloader import download_data_fyers
+    from common.login import initialize_fyers_client
+    
+    # Initialize Fyers client
+    fyers = initialize_fyers_client()
+    
+    # Download some sample data
+    df = download_data_fyers("NSE:SBIN-EQ", 
+                            (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d"),
+                            datetime.now().strftime("%Y-%m-%d"),
+                            gui_resolution="1d",
+                            fyers=fyers)
+    
+    # Create chart manager instance
+    chart_manager = ChartManager()
+    
+    # Calculate moving averages with shorter periods for better visibility
+    df['SMA10'] = df['close'].rolling(window=10, min_periods=1).mean()
+    df['SMA20'] = df['close'].rolling(window=20, min_periods=1).mean()
+    
+    # Create indicators dictionary
+    indicators = {
+        'SMA10': df['SMA10'],
+        'SMA20': df['SMA20']
+    }
+    
+    # Plot single chart with moving averages
+    chart_manager.plot_candlestick(df, 
+                                 title="SBIN Daily Chart with Moving Averages",
+                                 indicators=indicators) 
\ No newline at end of file
@@ -10,3 +10,23 @@ TOKEN_FILE = "token.json"
 # Data and backtest defaults
 DEFAULT_INTERVAL = '1d'
 INITIAL_CAPITAL = 10000.0
+
+# NSE trading holidays (weekdays only), the fallback when pandas_market_calendars (in
+# requirements.txt) is not installed. Maintained by hand: whoever bumps the year adds the
+# next year's dates from the NSE holiday circular, published each December.
+NSE_HOLIDAYS = frozenset([
+    # 2024
+    "2024-01-22", "2024-01-26", "2024-03-08", "2024-03-25", "2024-03-29",
+    "2024-04-11", "2024-04-17", "2024-05-01", "2024-05-20", "2024-06-17",
+    "2024-07-17", "2024-08-15", "2024-10-02", "2024-11-01", "2024-11-15",
+    "2024-11-20", "2024-12-25",
+    # 2025
+    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
+    "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
+    "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
+    # 2026
+    "2026-01-15", "2026-01-26", "2026-03-03", "2026-03-26", "2026-03-31",
+    "2026-04-03", "2026-04-14", "2026-05-01", "2026-05-28", "2026-06-26",
+    "2026-09-14", "2026-10-02", "2026-10-20", "2026-11-10", "2026-11-24",
+    "2026-12-25",
+])
@@ -1,21 +1,194 @@
 # data_downloader.py
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import lru_cache
+from pathlib import Path
+import numpy as np
 import pandas as pd
-from common.config import DEFAULT_INTERVAL
-from common.utils import to_local
+from common.config import DEFAULT_INTERVAL, NSE_HOLIDAYS
+from common.utils import to_local, LRUCache
+
+# Past candles are cached on disk as CACHE_DIR/<symbol>/<resolution>/<YYYY-MM-DD>.parquet
+CACHE_DIR = Path(os.getenv("FYERS_CACHE_DIR") or Path.home() / ".fyerfighter_cache")
+CANDLE_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+IST_OFFSET_SECONDS = 19800
+
+# GUI interval -> Fyers history resolution
+_RES_MAP = {
+    "1wk": "W",
+    "1d": "D",
+    "1h": "60",
+    "30m": "30",
+    "15m": "15",
+    "5m": "5",
+    "3m": "3",
+    "2m": "2",
+    "1m": "1",
+}
+# GUI interval -> bar length in seconds
+INTERVAL_SECONDS = {
+    "1m": 60,
+    "2m": 120,
+    "3m": 180,
+    "5m": 300,
+    "15m": 900,
+    "30m": 1800,
+    "1h": 3600,
+    "1d": 86400,
+    "1wk": 604800,
+}
+
+def client_key(fyers):
+    """Hashable stand-in for a Fyers client in cache keys, so caches never hold on to the client itself."""
+    # FyersModel.header is "client_id:access_token"; clients without one (test stubs) key on themselves
+    return getattr(fyers, "header", fyers)
+
+# Quotes younger than this are reused, so a tick and a Stop click in the same second share one request
+QUOTE_TTL = 0.5
+_quote_cache = LRUCache(maxsize=256)
+
+def get_latest_price(fyers, ticker):
+    """Last traded price for ticker from one Fyers quotes call, or None when unavailable."""
+    key = (client_key(fyers), ticker)
+    cached = _quote_cache.get(key)
+    if cached and time.time() - cached[0] < QUOTE_TTL:
+        return cached[1]
+    try:
+        response = fyers.quotes({"symbols": ticker})
+        if (response and "d" in response and len(response["d"]) > 0 and
+            "v" in response["d"][0] and "lp" in response["d"][0]["v"]):
+            price = float(response["d"][0]["v"]["lp"])
+            if price > 0:
+                _quote_cache[key] = (time.time(), price)
+                return price
+        return None
+    except Exception as e:
+        return None
 
 def map_resolution(gui_resolution):
-    mapping = {
-        "1wk": "W",
-        "1d": "D",
-        "1h": "60",
-        "15m": "15",
-        "5m": "5",
-        "3m": "3",
-        "2m": "2",
-        "1m": "1",
+    return _RES_MAP.get(gui_resolution, gui_resolution)
+
+@lru_cache(maxsize=1)
+def _nse_calendar():
+    """The NSE exchange calendar from pandas_market_calendars, or None if it is not installed."""
+    try:
+        import pandas_market_calendars as mcal
+    except ImportError:
+        return None
+    return mcal.get_calendar('NSE')
+
+def _trading_days(start, end):
+    """NSE trading days between start and end (inclusive) as YYYY-MM-DD strings, without calling the API."""
+    calendar = _nse_calendar()
+    if calendar is not None:
+        return [d.strftime("%Y-%m-%d") for d in calendar.valid_days(start, end)]
+    return pd.bdate_range(start, end, freq='C', holidays=sorted(NSE_HOLIDAYS)).strftime("%Y-%m-%d").tolist()
+
+def _last_trading_day(day):
+    """Most recent NSE trading day on or before day, without calling the API."""
+    valid = _trading_days(day - timedelta(days=10), day)
+    return pd.Timestamp(valid[-1]) if valid else day
+
+def _fetch_chunk(fyers, symbol, resolution, rfrom, rto):
+    """Fetch one window of candles from the Fyers history API."""
+    cdata = {
+        "symbol": symbol,
+        "resolution": str(resolution),
+        "date_format": "1",
+        "range_from": rfrom,
+        "range_to": rto,
+        "cont_flag": "0"
     }
-    return mapping.get(gui_resolution, gui_resolution)
+    return fyers.history(data=cdata)
+
+# Answered history windows that ended before today, keyed on the client's token rather than the client
+_closed_chunk_cache = LRUCache(maxsize=256)
+
+def _get_chunk(fyers, symbol, resolution, rfrom, rto, today):
+    """_fetch_chunk, memoized for windows that ended before today; errors are never cached."""
+    if rto >= today:
+        return _fetch_chunk(fyers, symbol, resolution, rfrom, rto)
+    key = (client_key(fyers), symbol, resolution, rfrom, rto)
+    response = _closed_chunk_cache.get(key)
+    if response is None:
+        response = _fetch_chunk(fyers, symbol, resolution, rfrom, rto)
+        if isinstance(response, dict) and response.get("s") in ("ok", "no_data"):
+            _closed_chunk_cache[key] = response
+    return response
+
+def _coalesce_windows(days, period_days):
+    """Group sorted YYYY-MM-DD days into consecutive runs of at most period_days days each."""
+    windows = []
+    run = []
+    for day in days:
+        if run and (pd.Timestamp(day) - pd.Timestamp(run[-1])).days != 1:
+            windows.append((run[0], run[-1]))
+            run = []
+        run.append(day)
+        if len(run) >= max(period_days, 1):
+            windows.append((run[0], run[-1]))
+            run = []
+    if run:
+        windows.append((run[0], run[-1]))
+    return windows
+
+def _rows_to_frame(arr):
+    """Build one OHLCV frame indexed by IST datetime from an (n, 6) array of raw Fyers candles."""
+    # One array, one timezone pass and one index for all chunks
+    arr = arr[np.argsort(arr[:, 0], kind='stable')]
+    df = pd.DataFrame(
+        {
+            'open': arr[:, 1],
+            'high': arr[:, 2],
+            'low': arr[:, 3],
+            'close': arr[:, 4],
+            'volume': arr[:, 5].astype(np.int64)
+        },
+        index=pd.to_datetime(arr[:, 0].astype(np.int64), unit='s', utc=True).tz_convert('Asia/Kolkata').rename('datetime')
+    )
+    return df[~df.index.duplicated(keep='first')]
+
+def _day_path(symbol, resolution, day):
+    return CACHE_DIR / symbol.replace(":", "_") / str(resolution) / f"{day}.parquet"
+
+def _store_days(symbol, resolution, days, arr):
+    """Write one Parquet file of raw candles per day; days without candles get an empty file so they are not re-fetched."""
+    if not days:
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Calendar day (IST) of every candle, as days since the epoch
+    candle_days = (arr[:, 0].astype(np.int64) + IST_OFFSET_SECONDS) // 86400
+    for day in days:
+        path = _day_path(symbol, resolution, day)
+        rows = arr[candle_days == np.datetime64(day, 'D').astype(np.int64)]
+        table = pa.table({
+            'timestamp': rows[:, 0].astype(np.int64),
+            'open': rows[:, 1],
+            'high': rows[:, 2],
+            'low': rows[:, 3],
+            'close': rows[:, 4],
+            'volume': rows[:, 5].astype(np.int64)
+        })
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            os.close(fd)
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error caching candles for {symbol} {day}:", e)
+
+def _read_days(symbol, resolution, days):
+    """Read cached days back as an (n, 6) array of raw candles."""
+    import pyarrow.dataset as ds
+
+    table = ds.dataset([str(_day_path(symbol, resolution, d)) for d in days], format='parquet').to_table(columns=CANDLE_COLUMNS)
+    return np.column_stack([table.column(c).to_numpy() for c in CANDLE_COLUMNS]).astype(np.float64).reshape(-1, 6)
 
 def download_data_fyers(symbol, start_date, end_date, period_days=60, gui_resolution='1d', fyers=None):
     """
@@ -27,73 +200,63 @@ def download_data_fyers(symbol, start_date, end_date, period_days=60, gui_resolu
     start_dt = pd.to_datetime(start_date)
     end_dt = pd.to_datetime(end_date)
     
-    # If end date is a weekend or holiday, look back for the most recent trading day
-    max_lookback = 5  # Maximum days to look back
-    lookback_count = 0
-    while lookback_count < max_lookback:
-        # Check if current end date is a weekend
-        if end_dt.weekday() >= 5:  # 5 is Saturday, 6 is Sunday
-            end_dt = end_dt - timedelta(days=1)
-            lookback_count += 1
-            continue
-            
-        # Try to get data for this date
-        test_data = {
-            "symbol": symbol,
-            "resolution": str(resolution),
-            "date_format": "1",
-            "range_from": end_dt.strftime("%Y-%m-%d"),
-            "range_to": end_dt.strftime("%Y-%m-%d"),
-            "cont_flag": "0"
-        }
-        test_response = fyers.history(data=test_data)
-        
-        # If we got data, this is a trading day
-        if test_response.get("candles"):
-            break
-            
-        # If no data, this might be a holiday, look back one more day
-        end_dt = end_dt - timedelta(days=1)
-        lookback_count += 1
-    
-    all_data = []
-    current_start = start_dt
-
-    while current_start < end_dt:
-        current_end = min(current_start + timedelta(days=period_days), end_dt)
-        rfrom = current_start.strftime("%Y-%m-%d")
-        rto = current_end.strftime("%Y-%m-%d")
-        print(f"Downloading data from {rfrom} to {rto}")
-
-        cdata = {
-            "symbol": symbol,
-            "resolution": str(resolution),
-            "date_format": "1",
-            "range_from": rfrom,
-            "range_to": rto,
-            "cont_flag": "0"
-        }
-        response = fyers.history(data=cdata)
-        print("Fyers response:", response)
-        if response.get("candles"):
-            data_chunk = pd.DataFrame.from_dict(response['candles'])
-            cols = ['datetime', 'open', 'high', 'low', 'close', 'volume']
-            data_chunk.columns = cols
-            data_chunk['datetime'] = pd.to_datetime(data_chunk['datetime'], unit='s')
-            # Timezone conversion as needed
-            data_chunk['datetime'] = data_chunk['datetime'].dt.tz_localize('UTC').dt.tz_convert('Asia/Kolkata')
-            data_chunk = data_chunk.set_index('datetime')
-            all_data.append(data_chunk)
-        else:
-            print("No candle data available for this period or error occurred:", response)
-        current_start = current_end
-
-    if all_data:
-        final_df = pd.concat(all_data)
-        final_df = final_df[~final_df.index.duplicated(keep='first')]
-        return final_df
+    # If a past end date is a weekend or holiday, use the most recent trading day instead
+    today = pd.Timestamp.now(tz='Asia/Kolkata').strftime("%Y-%m-%d")
+    if end_dt.strftime("%Y-%m-%d") < today:
+        end_dt = _last_trading_day(end_dt)
+
+    if not start_dt < end_dt:
+        return pd.DataFrame()
+
+    # Past days already on disk are read back; everything else is fetched
+    days = pd.date_range(start_dt, end_dt, freq='D').strftime("%Y-%m-%d").tolist()
+    cacheable = resolution != "W"
+    if cacheable:
+        cached_days = [d for d in days if d < today and _day_path(symbol, resolution, d).exists()]
+        cached_set = set(cached_days)
+        fetch_days = [d for d in days if d not in cached_set]
     else:
+        cached_days = []
+        fetch_days = days
+    windows = _coalesce_windows(fetch_days, period_days)
+
+    all_rows = []
+    # Past days the API actually answered for, split by whether the answer was "no_data"
+    answered_days = []
+    no_data_days = set()
+    if windows:
+        with ThreadPoolExecutor(max_workers=min(8, len(windows))) as ex:
+            futures = [ex.submit(_get_chunk, fyers, symbol, resolution, rfrom, rto, today) for rfrom, rto in windows]
+
+        for (rfrom, rto), future in zip(windows, futures):
+            print(f"Downloading data from {rfrom} to {rto}")
+            response = future.result()
+            if response.get("candles"):
+                all_rows.extend(response['candles'])
+            else:
+                print("No candle data available for this period or error occurred:", response)
+            # Errors, rate limits and timeouts are never cached; those days are fetched again next time
+            if response.get("s") in ("ok", "no_data"):
+                window_days = [d for d in fetch_days if rfrom <= d <= rto and d < today]
+                answered_days.extend(window_days)
+                if response.get("s") == "no_data":
+                    no_data_days.update(window_days)
+
+    arr = np.asarray(all_rows, dtype=np.float64).reshape(-1, 6)
+    if cacheable and answered_days:
+        # An "ok" window vouches for the days it returned candles for and for non-trading days;
+        # a trading day missing from it is left uncached rather than stored as empty
+        candle_days = set(np.datetime_as_string(
+            ((arr[:, 0].astype(np.int64) + IST_OFFSET_SECONDS) // 86400).astype('datetime64[D]')))
+        open_days = set(_trading_days(answered_days[0], answered_days[-1]))
+        _store_days(symbol, resolution,
+                    [d for d in answered_days if d in no_data_days or d in candle_days or d not in open_days], arr)
+    if cached_days:
+        arr = np.concatenate([_read_days(symbol, resolution, cached_days), arr])
+
+    if not len(arr):
         return pd.DataFrame()
+    return _rows_to_frame(arr)
 
 if __name__ == '__main__':
     # For testing purposes only: requires a Fyers client instance.
@@ -101,3 +264,6 @@ if __name__ == '__main__':
     fyers = initialize_fyers_client()
     df = download_data_fyers("NSE:SBIN-EQ", "2022-01-01", "2022-06-01", gui_resolution="1d", fyers=fyers)
     print(df.head())
+    # Second call is served from the on-disk cache
+    df = download_data_fyers("NSE:SBIN-EQ", "2022-01-01", "2022-06-01", gui_resolution="1d", fyers=fyers)
+    print(df.tail())
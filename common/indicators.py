@@ -1,37 +1,104 @@
 # indicators.py
+import sys
 import pandas as pd
 import numpy as np
 
+from common._njit import njit, HAVE_NUMBA
+
+@njit(cache=True)
+def _ha_kernel(o, h, l, c):
+    """Heikin-Ashi recurrence over float64 OHLC arrays in a single pass."""
+    n = o.shape[0]
+    ha_open = np.empty(n)
+    ha_high = np.empty(n)
+    ha_low = np.empty(n)
+    ha_close = (o + h + l + c) / 4
+    if n == 0:
+        return ha_open, ha_high, ha_low, ha_close
+    ha_open[0] = (o[0] + c[0]) / 2
+    for i in range(1, n):
+        ha_open[i] = (ha_open[i - 1] + ha_close[i - 1]) / 2
+    # No loop-carried dependency here, so LLVM can vectorize the max/min
+    for i in range(n):
+        ha_high[i] = max(h[i], ha_open[i], ha_close[i])
+        ha_low[i] = min(l[i], ha_open[i], ha_close[i])
+    return ha_open, ha_high, ha_low, ha_close
+
+def _ewma_loop(x, alpha):
+    """EWMA recurrence matching pandas ewm(adjust=False): leading NaNs stay NaN, gaps decay the old weight."""
+    n = x.shape[0]
+    y = np.empty_like(x)
+    weighted = np.nan
+    old_wt = 1.0
+    for i in range(n):
+        cur = x[i]
+        if weighted == weighted:
+            old_wt *= 1.0 - alpha
+            if cur == cur:
+                if weighted != cur:
+                    weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                old_wt = 1.0
+        elif cur == cur:
+            weighted = cur
+        y[i] = weighted
+    return y
+
+def _ewma_lfilter(x, alpha):
+    """EWMA as the IIR filter y[i] = alpha*x[i] + (1-alpha)*y[i-1], seeded so the first valid output equals its input."""
+    from scipy.signal import lfilter
+    y = np.full(x.shape[0], np.nan)
+    valid = np.flatnonzero(x == x)
+    if valid.size == 0:
+        return y
+    first = valid[0]
+    if valid.size != x.shape[0] - first:
+        # NaN gaps need the decayed weights of the scalar loop
+        return _ewma_loop(x, alpha)
+    seg = x[first:]
+    y[first:] = lfilter([alpha], [1.0, alpha - 1.0], seg, zi=[(1.0 - alpha) * seg[0]])[0]
+    return y
+
+if HAVE_NUMBA:
+    # Declared signatures (contiguous float64 or float32 input, writable or read-only, runtime alpha): compiled
+    # once at import, so the first backtest does not pay the JIT. float32 input is stored as float32 but the
+    # running average stays float64. No fastmath: the NaN seeding relies on x != x.
+    from numba import types
+    _ewma = njit(
+        [dt[::1](types.Array(dt, 1, 'C', readonly=ro), types.float64)
+         for dt in (types.float64, types.float32) for ro in (False, True)],
+        cache=True,
+    )(_ewma_loop)
+else:
+    # Without numba the plain loop is slow; scipy's lfilter runs the same recurrence in C
+    try:
+        import scipy.signal  # noqa: F401
+        _ewma = _ewma_lfilter
+    except ImportError:
+        _ewma = _ewma_loop
+
+# Compile ahead of the first chart/backtest when running inside the Streamlit server
+if HAVE_NUMBA and "streamlit" in sys.modules:
+    _ha_kernel(np.ones(2), np.ones(2), np.ones(2), np.ones(2))
+
 def heikin_ashi(df):
     """
     Convert standard OHLC candles into Heikin-Ashi candles.
     Returns a DataFrame with columns: HA_Open, HA_High, HA_Low, HA_Close.
     """
-    df = df.copy()
     # Ensure numeric conversion
-    df[['open', 'high', 'low', 'close']] = df[['open', 'high', 'low', 'close']].apply(pd.to_numeric, errors='coerce')
-    
-    ha = pd.DataFrame(index=df.index, columns=['HA_Open', 'HA_High', 'HA_Low', 'HA_Close'])
-    ha['HA_Close'] = ((df['open'] + df['high'] + df['low'] + df['close']) / 4).astype(float)
-    
-    # For the first candle, extract scalar values using .item() to avoid deprecation warnings
-    ha.iloc[0, ha.columns.get_loc('HA_Open')] = (df['open'].iloc[0] + df['close'].iloc[0]) / 2
-
-    for i in range(1, len(df)):
-        ha.iloc[i, ha.columns.get_loc('HA_Open')] = (ha['HA_Open'].iloc[i-1] + ha['HA_Close'].iloc[i-1]) / 2
+    ohlc = df[['open', 'high', 'low', 'close']]
+    if not all(pd.api.types.is_numeric_dtype(t) for t in ohlc.dtypes):
+        ohlc = ohlc.apply(pd.to_numeric, errors='coerce')
+    ohlc = ohlc.to_numpy(dtype=np.float64)
+    ha_open, ha_high, ha_low, ha_close = _ha_kernel(
+        np.ascontiguousarray(ohlc[:, 0]), np.ascontiguousarray(ohlc[:, 1]),
+        np.ascontiguousarray(ohlc[:, 2]), np.ascontiguousarray(ohlc[:, 3])
+    )
 
-    ha['HA_High'] = pd.concat([
-        df['high'].astype(float),
-        ha['HA_Open'].astype(float),
-        ha['HA_Close'].astype(float)
-    ], axis=1).apply(lambda row: max(row), axis=1)
-    
-    ha['HA_Low'] = pd.concat([
-        df['low'].astype(float),
-        ha['HA_Open'].astype(float),
-        ha['HA_Close'].astype(float)
-    ], axis=1).apply(lambda row: min(row), axis=1)
-    return ha
+    return pd.DataFrame(
+        {'HA_Open': ha_open, 'HA_High': ha_high, 'HA_Low': ha_low, 'HA_Close': ha_close},
+        index=df.index
+    )
 
 def ema(series, period=5):
     """
@@ -50,12 +117,15 @@ def ema(series, period=5):
         Series containing the EMA values.
     """
     # Ensure numeric conversion
-    series = pd.to_numeric(series, errors='coerce')
+    if not pd.api.types.is_numeric_dtype(series.dtype):
+        series = pd.to_numeric(series, errors='coerce')
     
-    # Calculate EMA using pandas ewm function
-    ema_values = series.ewm(span=period, adjust=False).mean()
+    # Calculate EMA with the compiled recurrence (same values as ewm(span=period, adjust=False));
+    # float32 input keeps float32 output and half the memory traffic
+    dtype = np.float32 if series.dtype == np.float32 else np.float64
+    ema_values = _ewma(np.ascontiguousarray(series.to_numpy(dtype=dtype)), 2 / (period + 1))
     
-    return ema_values
+    return pd.Series(ema_values, index=series.index, name=series.name)
 
 def ema_lows(df, period=5):
     """
@@ -77,16 +147,10 @@ def ema_lows(df, period=5):
     # Check if we need to convert to Heikin-Ashi first
     if 'HA_Low' not in df.columns:
         # Convert to Heikin-Ashi
-        ha_df = heikin_ashi(df)
-    else:
-        # Already Heikin-Ashi data
-        ha_df = df.copy()
+        df = heikin_ashi(df)
     
-    # Ensure numeric conversion
-    ha_df['HA_Low'] = pd.to_numeric(ha_df['HA_Low'], errors='coerce')
-    
-    # Calculate EMA on Heikin-Ashi lows
-    return ema(ha_df['HA_Low'], period)
+    # Calculate EMA on Heikin-Ashi lows (ema() coerces non-numeric input)
+    return ema(df['HA_Low'], period)
 
 def ema_highs(df, period=5):
     """
@@ -108,16 +172,10 @@ def ema_highs(df, period=5):
     # Check if we need to convert to Heikin-Ashi first
     if 'HA_High' not in df.columns:
         # Convert to Heikin-Ashi
-        ha_df = heikin_ashi(df)
-    else:
-        # Already Heikin-Ashi data
-        ha_df = df.copy()
-    
-    # Ensure numeric conversion
-    ha_df['HA_High'] = pd.to_numeric(ha_df['HA_High'], errors='coerce')
+        df = heikin_ashi(df)
     
-    # Calculate EMA on Heikin-Ashi highs
-    return ema(ha_df['HA_High'], period)
+    # Calculate EMA on Heikin-Ashi highs (ema() coerces non-numeric input)
+    return ema(df['HA_High'], period)
 
 # ----------------------------
 # TSI Calculation
@@ -126,15 +184,16 @@ def calculate_tsi(series, r=30, s=13, signal_period=13):
     """
     Calculate the True Strength Index (TSI) and its signal line.
     """
-    diff = series.diff()
-    abs_diff = diff.abs()
-    ema1 = diff.ewm(span=r, adjust=False).mean()
-    ema2 = ema1.ewm(span=s, adjust=False).mean()
-    abs_ema1 = abs_diff.ewm(span=r, adjust=False).mean()
-    abs_ema2 = abs_ema1.ewm(span=s, adjust=False).mean()
-    tsi = 100 * (ema2 / abs_ema2)
-    tsi_signal = tsi.ewm(span=signal_period, adjust=False).mean()
-    return tsi, tsi_signal
+    x = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+    diff = np.empty_like(x)
+    diff[:1] = np.nan
+    diff[1:] = x[1:] - x[:-1]
+    ema2 = _ewma(_ewma(diff, 2 / (r + 1)), 2 / (s + 1))
+    abs_ema2 = _ewma(_ewma(np.abs(diff), 2 / (r + 1)), 2 / (s + 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tsi = 100 * (ema2 / abs_ema2)
+    tsi_signal = _ewma(tsi, 2 / (signal_period + 1))
+    return pd.Series(tsi, index=series.index), pd.Series(tsi_signal, index=series.index)
 
 if __name__ == '__main__':
     import pandas as pd
@@ -1,11 +1,19 @@
 # login.py
 import re
+from functools import lru_cache
 from fyers_apiv3 import fyersModel
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from common.config import REDIRECT_URI, GRANT_TYPE, RESPONSE_TYPE, STATE
+from common.utils import LRUCache
 
-def generate_authcode_url(client_id, secret_key):
-    """Generate the Fyers authentication URL."""
-    appSession = fyersModel.SessionModel(
+# Validated clients by (client_id, token); bounded so old tokens don't pin clients for the process lifetime
+_client_cache = LRUCache(maxsize=16)
+
+@lru_cache(maxsize=32)
+def _app_session(client_id, secret_key):
+    """One SessionModel per app credentials, shared by the auth-code URL and token exchange."""
+    return fyersModel.SessionModel(
         client_id=client_id,
         redirect_uri=REDIRECT_URI,
         response_type=RESPONSE_TYPE,
@@ -13,19 +21,15 @@ def generate_authcode_url(client_id, secret_key):
         secret_key=secret_key,
         grant_type=GRANT_TYPE
     )
-    return appSession.generate_authcode()
+
+def generate_authcode_url(client_id, secret_key):
+    """Generate the Fyers authentication URL."""
+    return _app_session(client_id, secret_key).generate_authcode()
 
 def generate_access_token(auth_code, client_id, secret_key):
     """Generate an access token from the auth code."""
     try:
-        appSession = fyersModel.SessionModel(
-            client_id=client_id,
-            redirect_uri=REDIRECT_URI,
-            response_type=RESPONSE_TYPE,
-            state=STATE,
-            secret_key=secret_key,
-            grant_type=GRANT_TYPE
-        )
+        appSession = _app_session(client_id, secret_key)
         appSession.set_token(auth_code)
         response = appSession.generate_token()
         if "access_token" in response:
@@ -37,21 +41,46 @@ def generate_access_token(auth_code, client_id, secret_key):
         print("Error generating access token:", e)
         return None
 
+def _pool_session(fyers):
+    """Mount a larger keep-alive pool with retries on the client's HTTP session."""
+    retry = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(429, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),  # never replay order placement
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry)
+    fyers.service.session.mount("https://", adapter)
+
 def initialize_fyers_client(client_id, token):
     """Initialize the FyersModel with a client_id and token."""
     if not client_id or not token:
         return None
 
+    # Reuse the validated client (and its pooled session) for the same credentials
+    key = (client_id, token)
+    cached = _client_cache.get(key)
+    if cached is not None:
+        return cached
+
     fyers = fyersModel.FyersModel(
         client_id=client_id,
         token=token,
         is_async=False,
         log_path=""
     )
+    _pool_session(fyers)
     
     profile = fyers.get_profile()
     if profile and profile.get('s') == 'ok':
+        _client_cache[key] = fyers
         return fyers
     else:
         print("Invalid token or client_id.")
         return None
+
+def discard_fyers_client(fyers):
+    """Forget a cached client, on logout or when its token is replaced."""
+    for key in [k for k, v in list(_client_cache.items()) if v is fyers]:
+        _client_cache.pop(key, None)
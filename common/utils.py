@@ -3,6 +3,28 @@ import os
 import json
 import pandas as pd
 import io
+from collections import OrderedDict
+
+class LRUCache(OrderedDict):
+    """A dict holding at most maxsize entries; get() and assignment refresh an entry, the stalest is evicted."""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def get(self, key, default=None):
+        try:
+            self.move_to_end(key)
+            return self[key]
+        except KeyError:
+            # Missing, or evicted by another thread in between
+            return default
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
 
 def get_download_path():
     """Returns the default downloads path for linux or windows"""
@@ -17,14 +39,39 @@ def to_local(dt):
         dt = dt.tz_localize('UTC')
     return dt.tz_convert("Asia/Kolkata")
 
+def format_trade_history(trade_history_df):
+    """Display copy of a backtest trade history: dd-Mon-YYYY dates and rounded price, quantity and value."""
+    out = trade_history_df.copy()
+    dates = out['Date']
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates)
+    out['Date'] = dates.dt.strftime("%d-%b-%Y")
+    return out.round({'Price': 2, 'Quantity': 4, 'Value': 2})
+
+def _write_xlsx(columns, rows):
+    """Stream a header and rows into an in-memory xlsx and return it as BytesIO."""
+    import xlsxwriter
+
+    output = io.BytesIO()
+    # constant_memory flushes each row as it is written, so rows must go out in order
+    # (pandas' to_excel writes column by column, which this mode would drop)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'nan_inf_to_errors': True})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, list(columns))
+    for r, row in enumerate(rows, start=1):
+        worksheet.write_row(r, 0, row)
+    workbook.close()
+    output.seek(0)
+    return output
+
 def export_to_excel(trade_history_df):
     """
     Returns a BytesIO object containing the Excel file.
     This is designed to be used with st.download_button.
     """
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        trade_history_df.to_excel(writer, index=False)
-    output.seek(0)
-    return output
-    
\ No newline at end of file
+    df = format_trade_history(trade_history_df)
+    return _write_xlsx(df.columns, df.itertuples(index=False, name=None))
+
+def export_trade_log(trade_log):
+    """Excel export of a live session trade log held as {column: list of values}."""
+    return _write_xlsx(trade_log.keys(), zip(*trade_log.values()))
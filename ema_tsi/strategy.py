@@ -1,22 +1,82 @@
 # strategy.py
+import sys
+import time
 from datetime import timedelta
 import pandas as pd
 import numpy as np
-from common.data_downloader import download_data_fyers
-from common.indicators import heikin_ashi, ema_lows, ema_highs, calculate_tsi
-from common.utils import to_local
+from common._njit import njit, HAVE_NUMBA
+from common.data_downloader import download_data_fyers, client_key, INTERVAL_SECONDS
+from common.indicators import heikin_ashi, ema_lows, ema_highs, calculate_tsi, _ha_kernel, _ewma
+from common.utils import to_local, format_trade_history, LRUCache
 
-def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10, initial_capital=10000, interval='1d', ema_period=5, tsi_r_period=30):
-    # Download intraday and daily data
+@njit(cache=True, nogil=True)
+def _run(ha_close, prev_low, prev_ema_low, prev_ema_high, tsi_diff, sl_pct, tgt_pct, capital0):
+    """Walk the bars once: enter when the previous low touched its EMA with TSI above signal; exit at target, stoploss, the previous EMA high or a TSI cross down."""
+    n = ha_close.shape[0]
+    signals = np.zeros(n, dtype=np.int64)
+    positions = np.zeros(n, dtype=np.int64)
+    account_values = np.zeros(n)
+    trade_idx = np.empty(n, dtype=np.int64)
+    trade_side = np.empty(n, dtype=np.int8)
+    trade_price = np.empty(n)
+    trade_qty = np.empty(n)
+    trade_value = np.empty(n)
+    k = 0
+
+    capital = capital0
+    position = 0
+    shares = 0.0
+    entry_price = 0.0
+    for i in range(1, n):
+        price = ha_close[i]
+        if position == 0:
+            if prev_low[i] <= prev_ema_low[i] and tsi_diff[i] > 0:
+                entry_price = price
+                quantity = capital / price
+                trade_value[k] = quantity * price
+                capital = 0.0  # fully invested
+                shares = quantity
+                position = 1
+                signals[i] = 1
+                trade_idx[k] = i
+                trade_side[k] = 1
+                trade_price[k] = price
+                trade_qty[k] = quantity
+                k += 1
+        elif (price >= entry_price * (1 + tgt_pct / 100)
+              or price <= entry_price * (1 - sl_pct / 100)
+              or price >= prev_ema_high[i]
+              or tsi_diff[i] < 0):
+            capital = shares * price
+            trade_value[k] = capital
+            trade_qty[k] = shares
+            shares = 0.0
+            position = 0
+            signals[i] = -1
+            trade_idx[k] = i
+            trade_side[k] = -1
+            trade_price[k] = price
+            k += 1
+
+        positions[i] = position
+        account_values[i] = shares * price if position == 1 else capital
+
+    return (signals, positions, account_values, trade_idx[:k], trade_side[:k], trade_price[:k],
+            trade_qty[:k], trade_value[:k], capital, shares)
+
+# Compile ahead of the first backtest when running inside the Streamlit server
+if HAVE_NUMBA and "streamlit" in sys.modules:
+    _run(np.ones(2), np.ones(2), np.ones(2), np.ones(2), np.ones(2), 1.0, 1.0, 1.0)
+
+def _load_bars(ticker, start_date, end_date, fyers, interval, ema_period, tsi_r_period):
+    """Download ticker and add HA, EMA and TSI columns; None when there is no data."""
+    # Download intraday data (sorted and de-duplicated by download_data_fyers); no rule reads daily candles
     data = download_data_fyers(ticker, start_date, end_date, period_days=60, gui_resolution=interval, fyers=fyers)
     if data.empty:
         print("No data found for", ticker)
-        return None, None, None, None, None, None
+        return None
 
-    daily_data = download_data_fyers(ticker, start_date, end_date, period_days=30, gui_resolution="1d", fyers=fyers)
-    
     ha_data = heikin_ashi(data)
-    D_Data = heikin_ashi(daily_data)
     
     # Calculate EMA of Heikin-Ashi lows and highs with period=5
     ha_data['EMA_Lows'] = ema_lows(ha_data, period=ema_period)
@@ -25,110 +85,51 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
     # Calculate TSI and TSI signal
     ha_data['TSI'], ha_data['TSI_Signal'] = calculate_tsi(ha_data['HA_Close'], r=tsi_r_period, s=13, signal_period=13)
     
-    print("Daily HA data head:")
-    print(D_Data.head())
     print(ha_data.tail())
+    return ha_data
 
-    # Prepare signals and positions
-    ha_data['Signal'] = 0
-    ha_data['Position'] = 0
+def _bar_arrays(ha_data):
+    """Per-bar kernel inputs; "prev_*" are the previous candle's values (bar 0 is never traded)."""
+    return (
+        ha_data['HA_Close'].to_numpy(dtype=np.float64),
+        np.roll(ha_data['HA_Low'].to_numpy(dtype=np.float64), 1),
+        np.roll(ha_data['EMA_Lows'].to_numpy(dtype=np.float64), 1),
+        np.roll(ha_data['EMA_Highs'].to_numpy(dtype=np.float64), 1),
+        (ha_data['TSI'] - ha_data['TSI_Signal']).to_numpy(dtype=np.float64),
+    )
 
-    capital = float(initial_capital)
-    position = 0
-    shares = 0.0
-    entry_price = None
-    trades = []
-    account_value_history = []
-
-    for i in range(1, len(ha_data)):
-        row = ha_data.iloc[i]
-        price = float(row['HA_Close'])
-        date = ha_data.index[i]
-        local_date = to_local(date)
-
-        prev_candle = ha_data.iloc[i - 1]
-        prev_open = float(prev_candle["HA_Open"])
-        prev_close = float(prev_candle["HA_Close"])
-        prev_low = float(prev_candle["HA_Low"])
-        prev_ema_low = float(prev_candle["EMA_Lows"])
-        prev_ema_high = float(prev_candle["EMA_Highs"])
-
-        # Retrieve previous day's HA Open from daily data
-        # yesterday_date = date.date() - timedelta(days=1)
-        # daily_row = D_Data[D_Data.index.date == yesterday_date]
-        # if not daily_row.empty:
-        #     yest_ha_open = float(daily_row["HA_Open"].iloc[0])
-        # else:
-        #     yest_ha_open = None
-
-        # Retrieve the last available daily HA_Open before today
-        prev_daily = D_Data.loc[:date - pd.Timedelta(days=1)]
-        if not prev_daily.empty:
-            yest_ha_open = float(prev_daily['HA_Open'].iloc[-1])
-        else:
-            yest_ha_open = None
+def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10, initial_capital=10000, interval='1d', ema_period=5, tsi_r_period=30):
+    ha_data = _load_bars(ticker, start_date, end_date, fyers, interval, ema_period, tsi_r_period)
+    if ha_data is None:
+        return None, None, None, None, None, None
 
-        # Entry Condition (example: current price > previous candle open and candle was bearish)
-        if position == 0:
-            # Skip the yest_ha_open check if it's None
-            tsi_value = float(row['TSI'])
-            tsi_signal_value = float(row['TSI_Signal'])
-            tsi_diff = tsi_value - tsi_signal_value
-            
-            #if (price > prev_open) and (prev_open > prev_close) and 
-            if (prev_low <= prev_ema_low) and (tsi_diff > 0):
-                entry_price = price
-                quantity = capital/price  # Example fixed quantity; change this to accept user-qty from gui_trade.py 
-                trade_cost = quantity * price
-                capital = 0  # fully invested
-                shares = quantity
-                position = 1
-                ha_data.at[date, 'Signal'] = 1
-                trades.append((local_date, local_date.strftime("%H:%M"), "BUY", price, quantity, trade_cost))
-        else:
-            exit_condition = False
-            # Get TSI values for current candle
-            tsi_value = float(row['TSI'])
-            tsi_signal_value = float(row['TSI_Signal'])
-            tsi_diff = tsi_value - tsi_signal_value
-            
-            # if price < prev_low:
-            #     exit_condition = True
-            if price >= entry_price * (1 + target / 100):
-                exit_condition = True
-            elif price <= entry_price * (1 - stoploss / 100):
-                exit_condition = True
-            elif price >= prev_ema_high:
-                exit_condition = True
-            # New exit condition: if (tsi - tsi_signal) < 0
-            elif tsi_diff < 0:
-                exit_condition = True
-
-            if exit_condition:
-                trade_value = shares * price
-                capital = trade_value
-                quantity = shares
-                shares = 0.0
-                position = 0
-                ha_data.at[date, 'Signal'] = -1
-                trades.append((local_date, local_date.strftime("%H:%M"), "SELL", price, quantity, trade_value))
-                
-        ha_data.at[date, 'Position'] = position
-        current_value = shares * price if position == 1 else capital
-        account_value_history.append((date, current_value))
+    out = _run(*_bar_arrays(ha_data), float(stoploss), float(target), float(initial_capital))
+    return _summarize(ha_data, *out, initial_capital)
+
+def _summarize(ha_data, signals, positions, account_values, trade_idx, trade_side, trade_price, trade_qty, trade_value, capital, shares, initial_capital):
+    """Turn kernel outputs into the (ha_data, trades, perf_summary, perf_metrics, trade_history_df, account_df) result."""
+    index = ha_data.index
+    ha_close = ha_data['HA_Close'].to_numpy(dtype=np.float64)
+    acct_dates = index[1:]
+    acct_values = account_values[1:]
 
     # Close any open position at the end
-    if position == 1:
-        last_date = ha_data.index[-1]
-        local_last_date = to_local(last_date)
-        last_price = float(ha_data['HA_Close'].iloc[-1])
-        trade_value = shares * last_price
-        capital += trade_value
-        trades.append((local_last_date, local_last_date.strftime("%H:%M"), "SELL", last_price, shares, trade_value))
-        ha_data.at[last_date, 'Signal'] = -1
-        ha_data.at[last_date, 'Position'] = 0
-        account_value_history.append((last_date, capital))
-        position = 0
+    if positions[-1] == 1:
+        last_price = float(ha_close[-1])
+        final_value = shares * last_price
+        capital += final_value
+        trade_idx = np.append(trade_idx, len(index) - 1)
+        trade_side = np.append(trade_side, np.int8(-1))
+        trade_price = np.append(trade_price, last_price)
+        trade_qty = np.append(trade_qty, shares)
+        trade_value = np.append(trade_value, final_value)
+        signals[-1] = -1
+        positions[-1] = 0
+        acct_dates = acct_dates.append(index[-1:])
+        acct_values = np.append(acct_values, capital)
+
+    ha_data['Signal'] = signals
+    ha_data['Position'] = positions
 
     total_return = (capital - initial_capital) / initial_capital * 100
     print(f"Initial Capital: ${initial_capital:.2f}")
@@ -140,37 +141,36 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
     buy_hold_return = (last_price / first_price - 1) * 100
     print(f"Buy and Hold Return: {buy_hold_return:.2f}%")
 
-    account_df = pd.DataFrame(account_value_history, columns=['Date', 'AccountValue'])
-    account_df.set_index('Date', inplace=True)
-    running_max = account_df['AccountValue'].cummax()
-    drawdown = (account_df['AccountValue'] - running_max) / running_max
-    max_drawdown = drawdown.min() * 100
+    account_df = pd.DataFrame({'AccountValue': acct_values}, index=acct_dates.rename('Date'))
+    running_max = np.maximum.accumulate(acct_values)
+    drawdown = (acct_values - running_max) / running_max
+    max_drawdown = drawdown.min() * 100 if drawdown.size else np.nan
     print(f"Maximum Drawdown: {max_drawdown:.2f}%")
 
-    # Compute trade return metrics
-    trade_returns = []
-    open_buy_price = None
-    for trade in trades:
-        if trade[2] == "BUY":
-            open_buy_price = trade[3]
-        elif trade[2] == "SELL" and open_buy_price is not None:
-            ret = (trade[3] / open_buy_price - 1) * 100
-            trade_returns.append(ret)
-            open_buy_price = None
+    # Trades strictly alternate BUY/SELL, so each SELL pairs with the BUY before it
+    buys = trade_side == 1
+    trade_returns = (trade_price[~buys] / trade_price[buys] - 1) * 100
 
     num_trades = len(trade_returns)
-    winning_trades = sum(1 for r in trade_returns if r > 0)
-    losing_trades = sum(1 for r in trade_returns if r <= 0)
+    winning_trades = int((trade_returns > 0).sum())
+    losing_trades = num_trades - winning_trades
     win_rate = (winning_trades / num_trades * 100) if num_trades > 0 else 0
-    avg_trade_return = np.mean(trade_returns) if trade_returns else 0
+    avg_trade_return = trade_returns.mean() if num_trades else 0
 
-    trade_history_df = pd.DataFrame(trades, columns=['Date', 'Hour', 'Signal', 'Price', 'Quantity', 'Value'])
-    trade_history_df['Date'] = pd.to_datetime(trade_history_df['Date']).dt.strftime("%d-%b-%Y")
-    trade_history_df['Price'] = trade_history_df['Price'].round(2)
-    trade_history_df['Quantity'] = trade_history_df['Quantity'].round(4)
-    trade_history_df['Value'] = trade_history_df['Value'].round(2)
+    local_dates = to_local(index[trade_idx])
+    sides = np.where(buys, "BUY", "SELL")
+    trades = list(zip(local_dates, local_dates.strftime("%H:%M"), sides.tolist(),
+                      trade_price.tolist(), trade_qty.tolist(), trade_value.tolist()))
+    trade_history_df = pd.DataFrame({
+        'Date': local_dates,
+        'Hour': local_dates.strftime("%H:%M"),
+        'Signal': sides,
+        'Price': trade_price,
+        'Quantity': trade_qty,
+        'Value': trade_value,
+    })
     print("\nTrade History:")
-    print(trade_history_df.to_string(index=False))
+    print(format_trade_history(trade_history_df).to_string(index=False))
 
     # Return data, trade history, performance summaries, and the account DataFrame
     perf_summary = {
@@ -190,33 +190,170 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
     return ha_data, trades, perf_summary, perf_metrics, trade_history_df, account_df
 
 
-def should_enter_trade(fyers, ticker, live_price, interval="1m", ema_period=5, tsi_r_period=30):
-    from datetime import datetime, timedelta
-    # Download recent historical data to compute previous candle's HA values.
-    start_date = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    df = download_data_fyers(ticker, start_date, end_date, period_days=7, gui_resolution=interval, fyers=fyers)
-    if df is None or len(df) < 2:
-        return False
-    ha_df = heikin_ashi(df)
-    if len(ha_df) < 2:
-        return False
-    
-    # Calculate EMA of Heikin-Ashi lows
-    ha_df['EMA_Lows'] = ema_lows(ha_df, period=ema_period)
-    
-    # Calculate TSI and TSI signal
-    ha_df['TSI'], ha_df['TSI_Signal'] = calculate_tsi(ha_df['HA_Close'], r=tsi_r_period, s=13, signal_period=13)
-    
+def _ewm_step(prev, x, alpha):
+    """One ewm(adjust=False) step, matching common.indicators._ewma for gap-free input."""
+    if prev is None or prev != prev:
+        return x
+    if x != x or prev == x:
+        return prev
+    old_wt = 1.0 - alpha
+    return (old_wt * prev + alpha * x) / (old_wt + alpha)
+
+class LiveIndicatorState:
+    """Heikin-Ashi, EMA and TSI recurrences as of the last closed candle, advanced in O(1) per candle."""
+
+    def __init__(self, ema_period=5, tsi_r_period=30, tsi_s_period=13, signal_period=13):
+        self.alpha_ema = 2 / (ema_period + 1)
+        self.alpha_r = 2 / (tsi_r_period + 1)
+        self.alpha_s = 2 / (tsi_s_period + 1)
+        self.alpha_signal = 2 / (signal_period + 1)
+        self.state = None
+        self.row = None
+        self.last_ts = None
+
+    def _step(self, o, h, l, c):
+        """Recurrence state and indicator row after candle (o, h, l, c), without committing it."""
+        prev = self.state or {}
+        ha_close = (o + h + l + c) / 4
+        if self.state is None:
+            ha_open = (o + c) / 2
+        else:
+            ha_open = (prev['ha_open'] + prev['ha_close']) / 2
+        ha_high = max(h, ha_open, ha_close)
+        ha_low = min(l, ha_open, ha_close)
+
+        ema_low = _ewm_step(prev.get('ema_low'), ha_low, self.alpha_ema)
+        ema_high = _ewm_step(prev.get('ema_high'), ha_high, self.alpha_ema)
+        if self.state is None:
+            ema1 = ema2 = abs_ema1 = abs_ema2 = tsi_signal = None
+            tsi = np.nan
+        else:
+            diff = ha_close - prev['ha_close']
+            ema1 = _ewm_step(prev['ema1'], diff, self.alpha_r)
+            ema2 = _ewm_step(prev['ema2'], ema1, self.alpha_s)
+            abs_ema1 = _ewm_step(prev['abs_ema1'], abs(diff), self.alpha_r)
+            abs_ema2 = _ewm_step(prev['abs_ema2'], abs_ema1, self.alpha_s)
+            tsi = 100 * (ema2 / abs_ema2) if abs_ema2 else np.nan
+            tsi_signal = _ewm_step(prev['tsi_signal'], tsi, self.alpha_signal)
+
+        state = {'ha_open': ha_open, 'ha_close': ha_close, 'ema_low': ema_low, 'ema_high': ema_high,
+                 'ema1': ema1, 'ema2': ema2, 'abs_ema1': abs_ema1, 'abs_ema2': abs_ema2, 'tsi_signal': tsi_signal}
+        row = {'HA_Open': ha_open, 'HA_High': ha_high, 'HA_Low': ha_low, 'HA_Close': ha_close,
+               'EMA_Lows': ema_low, 'EMA_Highs': ema_high, 'TSI': tsi,
+               'TSI_Signal': np.nan if tsi_signal is None else tsi_signal}
+        return state, row
+
+    def update(self, ts, o, h, l, c):
+        """Commit a closed candle stamped ts."""
+        self.state, self.row = self._step(o, h, l, c)
+        self.last_ts = ts
+
+    def seed(self, ts, ohlc):
+        """Commit a block of closed candles (n x 4 OHLC array, last one stamped ts) with the array kernels."""
+        o, h, l, c = (np.ascontiguousarray(ohlc[:, i], dtype=np.float64) for i in range(4))
+        ha_open, ha_high, ha_low, ha_close = _ha_kernel(o, h, l, c)
+        ema_low = _ewma(ha_low, self.alpha_ema)
+        ema_high = _ewma(ha_high, self.alpha_ema)
+        diff = np.empty_like(ha_close)
+        diff[:1] = np.nan
+        diff[1:] = ha_close[1:] - ha_close[:-1]
+        ema1 = _ewma(diff, self.alpha_r)
+        ema2 = _ewma(ema1, self.alpha_s)
+        abs_ema1 = _ewma(np.abs(diff), self.alpha_r)
+        abs_ema2 = _ewma(abs_ema1, self.alpha_s)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tsi = 100 * (ema2 / abs_ema2)
+        tsi_signal = _ewma(tsi, self.alpha_signal)
+
+        last = lambda a: float(a[-1])
+        self.state = {'ha_open': last(ha_open), 'ha_close': last(ha_close), 'ema_low': last(ema_low),
+                      'ema_high': last(ema_high), 'ema1': last(ema1), 'ema2': last(ema2),
+                      'abs_ema1': last(abs_ema1), 'abs_ema2': last(abs_ema2), 'tsi_signal': last(tsi_signal)}
+        self.row = {'HA_Open': last(ha_open), 'HA_High': last(ha_high), 'HA_Low': last(ha_low),
+                    'HA_Close': last(ha_close), 'EMA_Lows': last(ema_low), 'EMA_Highs': last(ema_high),
+                    'TSI': last(tsi), 'TSI_Signal': last(tsi_signal)}
+        self.last_ts = ts
+
+    def peek(self, o, h, l, c):
+        """Indicator row for the still-forming candle."""
+        return self._step(o, h, l, c)[1]
+
+_MIN_CANDLE_TTL = 5
+# Per (client, ticker, interval, ema_period, tsi_r_period); bounded so stale clients and settings age out
+_live_states = LRUCache(maxsize=64)
+_live_rows_cache = LRUCache(maxsize=64)
+
+def _advance_live_state(key, fyers, ticker, interval):
+    """Fold newly closed candles into the key's LiveIndicatorState; returns (state, forming OHLC, forming time) or None."""
+    state = _live_states.get(key)
+    # Exchange-local dates, the same calendar download_data_fyers uses for "today"
+    end_date = pd.Timestamp.now(tz='Asia/Kolkata')
+    if state is None:
+        start_date = end_date - timedelta(days=7)
+    else:
+        # From the day before the committed candle: a same-day start/end would be an empty range
+        start_date = state.last_ts.tz_convert('Asia/Kolkata') - timedelta(days=1)
+    df = download_data_fyers(ticker, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"),
+                             period_days=7, gui_resolution=interval, fyers=fyers)
+    if df is None or df.empty:
+        return None
+    if state is not None:
+        df = df[df.index > state.last_ts]
+        if df.empty:
+            # The committed candle is no longer the previous one; start over
+            _live_states.pop(key, None)
+            return _advance_live_state(key, fyers, ticker, interval)
+    elif len(df) < 2:
+        return None
+    else:
+        state = _live_states[key] = LiveIndicatorState(*key[3:])
+
+    ohlc = df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64)
+    if state.state is None:
+        # Warm-up: the whole history in one vectorized pass instead of a Python step per candle
+        state.seed(df.index[-2], ohlc[:-1])
+    else:
+        for ts, (o, h, l, c) in zip(df.index[:-1], ohlc[:-1].tolist()):
+            state.update(ts, o, h, l, c)
+    return state, ohlc[-1].tolist(), df.index[-1]
+
+def live_indicator_rows(fyers, ticker, interval="1m", ema_period=5, tsi_r_period=30, live_price=None):
+    """(previous closed candle, forming candle) indicator rows, or None when fewer than two candles exist.
+
+    Closed candles are folded into the state once per bar: seeded from a 7-day download, then only candles
+    since the last closed one. In between, the forming candle is patched with live_price and re-evaluated
+    with peek(), so its TSI follows every tick without a download.
+    """
+    key = (client_key(fyers), ticker, interval, ema_period, tsi_r_period)
+    now = time.time()
+    cached = _live_rows_cache.get(key)
+    if not cached or now >= cached[0]:
+        result = _advance_live_state(key, fyers, ticker, interval)
+        if result is None:
+            _live_rows_cache[key] = (now + _MIN_CANDLE_TTL, None, None)
+            return None
+        state, forming, forming_ts = result
+        bar_close = forming_ts.timestamp() + INTERVAL_SECONDS.get(interval, 60)
+        cached = _live_rows_cache[key] = (max(bar_close, now + _MIN_CANDLE_TTL), state, forming)
+
+    _, state, forming = cached
+    if state is None:
+        return None
+    if live_price is not None:
+        # The forming candle's high and low keep every tick seen in this bar
+        o, h, l, _ = forming
+        forming[:] = [o, max(h, live_price), min(l, live_price), live_price]
+    return state.row, state.peek(*forming)
+
+def _entry_signal(prev_candle, curr_candle, live_price):
+    """Entry rule on the previous closed candle and the forming candle's TSI."""
     # Use the previous candle from the HA calculations.
-    prev_candle = ha_df.iloc[-2]
     prev_open = prev_candle['HA_Open']
     prev_close = prev_candle['HA_Close']
     prev_low = prev_candle['HA_Low']
     prev_ema_low = prev_candle['EMA_Lows']
     
     # Get current TSI values
-    curr_candle = ha_df.iloc[-1]
     tsi_value = curr_candle['TSI']
     tsi_signal_value = curr_candle['TSI_Signal']
     tsi_diff = tsi_value - tsi_signal_value
@@ -227,30 +364,12 @@ def should_enter_trade(fyers, ticker, live_price, interval="1m", ema_period=5, t
         return True
     return False
 
-def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price, interval="1m", ema_period=5, tsi_r_period=30):
-    from datetime import datetime, timedelta
-    # Download recent historical data to compute previous candle's HA values.
-    start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
-    if df is None or len(df) < 2:
-        return False
-    ha_df = heikin_ashi(df)
-    if len(ha_df) < 2:
-        return False
-    
-    # Calculate EMA of Heikin-Ashi highs
-    ha_df['EMA_Highs'] = ema_highs(ha_df, period=ema_period)
-    
-    # Calculate TSI and TSI signal
-    ha_df['TSI'], ha_df['TSI_Signal'] = calculate_tsi(ha_df['HA_Close'], r=tsi_r_period, s=13, signal_period=13)
-    
-    prev_candle = ha_df.iloc[-2]
+def _exit_signal(prev_candle, curr_candle, entry_price, stoploss, target, live_price):
+    """Exit rule on the previous closed candle and the forming candle's TSI."""
     prev_low = prev_candle['HA_Low']
     prev_ema_high = prev_candle['EMA_Highs']
     
     # Get current TSI values
-    curr_candle = ha_df.iloc[-1]
     tsi_value = curr_candle['TSI']
     tsi_signal_value = curr_candle['TSI_Signal']
     tsi_diff = tsi_value - tsi_signal_value
@@ -277,6 +396,51 @@ def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price,
     
     return False
 
+def _condition_values(rows):
+    """Condition values shown in the live trading panel; zeros when there are not enough candles."""
+    if rows is None:
+        return {
+            'prev_open': 0,
+            'prev_close': 0,
+            'prev_low': 0,
+            'prev_ema_low': 0,
+            'prev_ema_high': 0,
+            'tsi_value': 0,
+            'tsi_signal': 0
+        }
+    prev_candle, curr_candle = rows
+    return {
+        'prev_open': float(prev_candle['HA_Open']),
+        'prev_close': float(prev_candle['HA_Close']),
+        'prev_low': float(prev_candle['HA_Low']),
+        'prev_ema_low': float(prev_candle['EMA_Lows']),
+        'prev_ema_high': float(prev_candle['EMA_Highs']),
+        'tsi_value': float(curr_candle['TSI']),
+        'tsi_signal': float(curr_candle['TSI_Signal'])
+    }
+
+def should_enter_trade(fyers, ticker, live_price, interval="1m", ema_period=5, tsi_r_period=30):
+    rows = live_indicator_rows(fyers, ticker, interval, ema_period, tsi_r_period, live_price)
+    if rows is None:
+        return False
+    return _entry_signal(*rows, live_price)
+
+def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price, interval="1m", ema_period=5, tsi_r_period=30):
+    rows = live_indicator_rows(fyers, ticker, interval, ema_period, tsi_r_period, live_price)
+    if rows is None:
+        return False
+    return _exit_signal(*rows, entry_price, stoploss, target, live_price)
+
+def evaluate_tick(fyers, ticker, live_price, interval="1m", ema_period=5, tsi_r_period=30, entry_price=None, stoploss=5, target=10):
+    """One indicator lookup per tick: (enter, exit, condition values). Exit is checked when entry_price is set, entry otherwise."""
+    rows = live_indicator_rows(fyers, ticker, interval, ema_period, tsi_r_period, live_price)
+    conditions = _condition_values(rows)
+    if rows is None:
+        return False, False, conditions
+    if entry_price is None:
+        return _entry_signal(*rows, live_price), False, conditions
+    return False, _exit_signal(*rows, entry_price, stoploss, target, live_price), conditions
+
 if __name__ == '__main__':
     # For testing your strategy; requires a Fyers client.
     from common.login import initialize_fyers_client
@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import time
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import sys
 import os
@@ -10,10 +9,12 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from common.data_downloader import download_data_fyers
-from common.indicators import heikin_ashi, ema_lows, ema_highs, calculate_tsi
-from common.utils import to_local, export_to_excel
-from ema_tsi.strategy import backtest_strategy, should_enter_trade, should_exit_trade
+from common.data_downloader import get_latest_price, INTERVAL_SECONDS
+from common.utils import to_local, export_to_excel, export_trade_log, format_trade_history
+from ema_tsi.strategy import backtest_strategy, evaluate_tick
+
+TRADE_LOG_COLUMNS = ("Timestamp", "Signal", "Price", "Quantity", "PnL")
+UNCHANGED_TICK_SECONDS = 5
 
 def initialize_trading_state():
     if 'ema_tsi_position' not in st.session_state:
@@ -23,85 +24,115 @@ def initialize_trading_state():
     if 'ema_tsi_entry_time' not in st.session_state:
         st.session_state.ema_tsi_entry_time = None
     if 'ema_tsi_trade_log' not in st.session_state:
-        st.session_state.ema_tsi_trade_log = []
+        # Columnar (one list per column) so the log table is built without transposing rows
+        st.session_state.ema_tsi_trade_log = {column: [] for column in TRADE_LOG_COLUMNS}
     if 'ema_tsi_running' not in st.session_state:
         st.session_state.ema_tsi_running = False
 
-def get_latest_price(fyers, ticker):
-    try:
-        response = fyers.quotes({"symbols": ticker})
-        if (response and "d" in response and len(response["d"]) > 0 and 
-            "v" in response["d"][0] and "lp" in response["d"][0]["v"]):
-            price = float(response["d"][0]["v"]["lp"])
-            if price > 0:
-                return price
-        return None
-    except Exception as e:
-        return None
+def _log_trade(*values):
+    """Append one (timestamp, signal, price, quantity, pnl) row to the session trade log."""
+    for column, value in zip(TRADE_LOG_COLUMNS, values):
+        st.session_state.ema_tsi_trade_log[column].append(value)
+
+def _show_conditions(conditions):
+    """Render the condition values panel."""
+    st.markdown("#### Condition Values")
+    cond_col1, cond_col2, cond_col3 = st.columns(3)
+    with cond_col1:
+        st.write(f"Prev Open: ₹{conditions['prev_open']:.2f}")
+        st.write(f"Prev Close: ₹{conditions['prev_close']:.2f}")
+        st.write(f"Prev Low: ₹{conditions['prev_low']:.2f}")
+    with cond_col2:
+        st.write(f"EMA Low: ₹{conditions['prev_ema_low']:.2f}")
+        st.write(f"EMA High: ₹{conditions['prev_ema_high']:.2f}")
+    with cond_col3:
+        st.write(f"TSI: {conditions['tsi_value']:.4f}")
+        st.write(f"TSI Signal: {conditions['tsi_signal']:.4f}")
+
+@st.fragment(run_every="1s")
+def _tick_fragment(symbol, interval, ema_period, tsi_r_period, stoploss, target, qty, trading_mode):
+    """One trading tick: read the latest price, apply the entry/exit rules and redraw the status panel."""
+    if not st.session_state.ema_tsi_running:
+        return
+    fyers = st.session_state.fyers_client
+    trading_status = "Running (LIVE)" if trading_mode == "Live Trade" else "Running (PAPER)"
 
-def get_condition_values(fyers, ticker, live_price, interval, ema_period=5, tsi_r_period=30):
-    """Get all condition values for display in GUI"""
     try:
-        start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
-        end_date = datetime.now().strftime("%Y-%m-%d")
-        df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
-        if df is None or len(df) < 2:
-            return {
-                'prev_open': 0,
-                'prev_close': 0,
-                'prev_low': 0,
-                'prev_ema_low': 0,
-                'prev_ema_high': 0,
-                'tsi_value': 0,
-                'tsi_signal': 0
-            }
-        
-        ha_df = heikin_ashi(df)
-        if len(ha_df) < 2:
-            return {
-                'prev_open': 0,
-                'prev_close': 0,
-                'prev_low': 0,
-                'prev_ema_low': 0,
-                'prev_ema_high': 0,
-                'tsi_value': 0,
-                'tsi_signal': 0
-            }
-        
-        ha_df['EMA_Lows'] = ema_lows(ha_df, period=ema_period)
-        ha_df['EMA_Highs'] = ema_highs(ha_df, period=ema_period)
-        ha_df['TSI'], ha_df['TSI_Signal'] = calculate_tsi(ha_df['HA_Close'], r=tsi_r_period, s=13, signal_period=13)
-        
-        prev_candle = ha_df.iloc[-2]
-        prev_open = float(prev_candle['HA_Open'])
-        prev_close = float(prev_candle['HA_Close'])
-        prev_low = float(prev_candle['HA_Low'])
-        prev_ema_low = float(prev_candle['EMA_Lows'])
-        prev_ema_high = float(prev_candle['EMA_Highs'])
-        
-        curr_candle = ha_df.iloc[-1]
-        tsi_value = float(curr_candle['TSI'])
-        tsi_signal = float(curr_candle['TSI_Signal'])
-        
-        return {
-            'prev_open': prev_open,
-            'prev_close': prev_close,
-            'prev_low': prev_low,
-            'prev_ema_low': prev_ema_low,
-            'prev_ema_high': prev_ema_high,
-            'tsi_value': tsi_value,
-            'tsi_signal': tsi_signal
-        }
+        price = get_latest_price(fyers, symbol)
+        if price is None:
+            with st.container():
+                st.info(f"Status: {trading_status}")
+                st.warning("Waiting for valid market data...")
+            return
+
+        # Same price, same bar and same settings as a recent tick: nothing can have changed
+        tick_key = (symbol, interval, ema_period, tsi_r_period, stoploss, target, qty, price,
+                    st.session_state.ema_tsi_position, int(time.time() // INTERVAL_SECONDS.get(interval, 60)))
+        last_tick = st.session_state.get("ema_tsi_last_tick")
+        if last_tick and last_tick[0] == tick_key and time.time() - last_tick[1] < UNCHANGED_TICK_SECONDS:
+            status, conditions = last_tick[2], last_tick[3]
+        else:
+            now_dt = datetime.now()
+            now = now_dt.strftime("%H:%M:%S")
+            dt = now_dt.strftime("%Y-%m-%d %H:%M:%S")
+
+            # One indicator lookup drives the signal check and the conditions panel
+            entry_price = st.session_state.ema_tsi_entry_price if st.session_state.ema_tsi_position == 1 else None
+            enter, exit_signal, conditions = evaluate_tick(fyers, symbol, price, interval, ema_period, tsi_r_period, entry_price, stoploss, target)
+
+            if st.session_state.ema_tsi_position == 0:
+                if enter:
+                    st.session_state.ema_tsi_entry_price = price
+                    st.session_state.ema_tsi_entry_time = now
+                    st.session_state.ema_tsi_position = 1
+                    _log_trade(dt, "BUY", price, qty, 0.0)
+                    status = ("success", f"BUY executed at ₹{price:.2f}")
+                else:
+                    status = ("info", "Waiting for entry signal...")
+            elif exit_signal:
+                pnl = (price - st.session_state.ema_tsi_entry_price) * qty
+                _log_trade(dt, "SELL", price, qty, round(pnl, 2))
+                st.session_state.ema_tsi_last_exit = (
+                    f"SELL executed at ₹{price:.2f} | P&L: ₹{pnl:.2f} "
+                    f"({((pnl / (st.session_state.ema_tsi_entry_price * qty)) * 100):.2f}%)"
+                )
+                st.session_state.ema_tsi_position = 0
+                st.session_state.ema_tsi_entry_price = None
+                st.session_state.ema_tsi_entry_time = None
+                st.session_state.ema_tsi_running = False
+                st.rerun()
+            else:
+                status = ("info", f"Status: {trading_status}")
+
+            st.session_state.ema_tsi_last_tick = (tick_key, time.time(), status, conditions)
     except Exception as e:
-        return {
-            'prev_open': 0,
-            'prev_close': 0,
-            'prev_low': 0,
-            'prev_ema_low': 0,
-            'prev_ema_high': 0,
-            'tsi_value': 0,
-            'tsi_signal': 0
-        }
+        st.error(f"Error: {e}")
+        return
+
+    # Render the whole panel in one container so it updates as a unit
+    with st.container():
+        getattr(st, status[0])(status[1])
+        st.metric("Current Price", f"₹{price:.2f}")
+        if st.session_state.ema_tsi_position == 1:
+            entry_price = st.session_state.ema_tsi_entry_price
+            current_pnl = (price - entry_price) * qty
+            st.metric("Entry Price", f"₹{entry_price:.2f}", delta=f"@ {st.session_state.ema_tsi_entry_time}")
+            st.metric("Current P&L", f"₹{current_pnl:.2f}", delta=f"{((current_pnl / (entry_price * qty)) * 100):.2f}%")
+        _show_conditions(conditions)
+
+def _start_trading():
+    st.session_state.ema_tsi_running = True
+
+def _stop_trading(symbol):
+    """Stop-button callback; runs before the rerun so no further tick is processed."""
+    st.session_state.ema_tsi_running = False
+    if st.session_state.ema_tsi_position == 1:
+        price = get_latest_price(st.session_state.fyers_client, symbol)
+        if price:
+            dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            pnl = (price - st.session_state.ema_tsi_entry_price) * st.session_state.ema_tsi_qty
+            _log_trade(dt, "SELL", price, st.session_state.ema_tsi_qty, round(pnl, 2))
+            st.session_state.ema_tsi_position = 0
 
 def show_trade():
     st.subheader("EMA TSI Strategy - Live Trading")
@@ -127,122 +158,70 @@ def show_trade():
     
     with col2:
         st.markdown("### Current Status")
-        status_placeholder = st.empty()
-        price_placeholder = st.empty()
-        entry_placeholder = st.empty()
-        pnl_placeholder = st.empty()
-        
-        conditions_placeholder = st.empty()
+        if st.session_state.ema_tsi_running:
+            _tick_fragment(symbol.upper(), interval, ema_period, tsi_r_period, stoploss, target, qty, trading_mode)
     
     if st.session_state.ema_tsi_running:
-        st.session_state.ema_tsi_running = True
-        
-        if st.button("Stop Trading", key="ema_tsi_stop"):
-            st.session_state.ema_tsi_running = False
-            if st.session_state.ema_tsi_position == 1:
-                price = get_latest_price(st.session_state.fyers_client, symbol.upper())
-                if price:
-                    dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    pnl = (price - st.session_state.ema_tsi_entry_price) * st.session_state.ema_tsi_qty
-                    st.session_state.ema_tsi_trade_log.append([dt, "SELL", price, st.session_state.ema_tsi_qty, round(pnl, 2)])
-                    st.session_state.ema_tsi_position = 0
-            st.rerun()
-        
-        trading_status = "Running"
-        if trading_mode == "Live Trade":
-            trading_status += " (LIVE)"
-        else:
-            trading_status += " (PAPER)"
-        
-        status_placeholder.info(f"Status: {trading_status}")
-        
-        progress_bar = st.progress(0)
-        update_count = 0
-        max_updates = 60
-        
-        while st.session_state.ema_tsi_running and update_count < max_updates:
-            try:
-                price = get_latest_price(st.session_state.fyers_client, symbol.upper())
-                
-                if price is None:
-                    status_placeholder.warning("Waiting for valid market data...")
-                    time.sleep(1)
-                    update_count += 1
-                    progress_bar.progress(min(update_count / max_updates, 0.99))
-                    continue
-                
-                now = datetime.now().strftime("%H:%M:%S")
-                dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                price_placeholder.metric("Current Price", f"₹{price:.2f}")
-                
-                if st.session_state.ema_tsi_position == 0:
-                    if should_enter_trade(st.session_state.fyers_client, symbol.upper(), price, interval, ema_period, tsi_r_period):
-                        st.session_state.ema_tsi_entry_price = price
-                        st.session_state.ema_tsi_entry_time = now
-                        st.session_state.ema_tsi_qty = qty
-                        st.session_state.ema_tsi_position = 1
-                        st.session_state.ema_tsi_trade_log.append([dt, "BUY", price, qty, 0.0])
-                        status_placeholder.success(f"BUY executed at ₹{price:.2f}")
-                        entry_placeholder.metric("Entry Price", f"₹{st.session_state.ema_tsi_entry_price:.2f}", delta=f"@ {st.session_state.ema_tsi_entry_time}")
-                    else:
-                        status_placeholder.info("Waiting for entry signal...")
-                else:
-                    if should_exit_trade(st.session_state.fyers_client, symbol.upper(), st.session_state.ema_tsi_entry_price, stoploss, target, price, interval, ema_period, tsi_r_period):
-                        pnl = (price - st.session_state.ema_tsi_entry_price) * qty
-                        st.session_state.ema_tsi_trade_log.append([dt, "SELL", price, qty, round(pnl, 2)])
-                        pnl_placeholder.metric("P&L", f"₹{pnl:.2f}", delta=f"{((pnl / (st.session_state.ema_tsi_entry_price * qty)) * 100):.2f}%")
-                        status_placeholder.success(f"SELL executed at ₹{price:.2f} | P&L: ₹{pnl:.2f}")
-                        st.session_state.ema_tsi_position = 0
-                        st.session_state.ema_tsi_entry_price = None
-                        st.session_state.ema_tsi_entry_time = None
-                        st.session_state.ema_tsi_running = False
-                        st.info("Exit triggered. Trading stopped.")
-                        break
-                    else:
-                        entry_placeholder.metric("Entry Price", f"₹{st.session_state.ema_tsi_entry_price:.2f}", delta=f"@ {st.session_state.ema_tsi_entry_time}")
-                        if st.session_state.ema_tsi_position == 1:
-                            current_pnl = (price - st.session_state.ema_tsi_entry_price) * qty
-                            pnl_placeholder.metric("Current P&L", f"₹{current_pnl:.2f}", delta=f"{((current_pnl / (st.session_state.ema_tsi_entry_price * qty)) * 100):.2f}%")
-                
-                conditions = get_condition_values(st.session_state.fyers_client, symbol.upper(), price, interval, ema_period, tsi_r_period)
-                with conditions_placeholder.container():
-                    st.markdown("#### Condition Values")
-                    cond_col1, cond_col2, cond_col3 = st.columns(3)
-                    with cond_col1:
-                        st.write(f"Prev Open: ₹{conditions['prev_open']:.2f}")
-                        st.write(f"Prev Close: ₹{conditions['prev_close']:.2f}")
-                        st.write(f"Prev Low: ₹{conditions['prev_low']:.2f}")
-                    with cond_col2:
-                        st.write(f"EMA Low: ₹{conditions['prev_ema_low']:.2f}")
-                        st.write(f"EMA High: ₹{conditions['prev_ema_high']:.2f}")
-                    with cond_col3:
-                        st.write(f"TSI: {conditions['tsi_value']:.4f}")
-                        st.write(f"TSI Signal: {conditions['tsi_signal']:.4f}")
-                
-                time.sleep(1)
-                update_count += 1
-                progress_bar.progress(min(update_count / max_updates, 0.99))
-            
-            except Exception as e:
-                status_placeholder.error(f"Error: {e}")
-                break
-        
-        progress_bar.empty()
+        st.button("Stop Trading", key="ema_tsi_stop", on_click=_stop_trading, args=(symbol.upper(),))
     else:
-        if st.button("Start Trading", key="ema_tsi_start"):
-            st.session_state.ema_tsi_running = True
-            st.rerun()
+        last_exit = st.session_state.pop("ema_tsi_last_exit", None)
+        if last_exit:
+            st.success(last_exit)
+            st.info("Exit triggered. Trading stopped.")
+
+        st.button("Start Trading", key="ema_tsi_start", on_click=_start_trading)
         
-        if st.session_state.ema_tsi_trade_log:
+        n_trades = len(st.session_state.ema_tsi_trade_log["Timestamp"])
+        if n_trades:
             st.markdown("### Session Trade Log")
-            log_df = pd.DataFrame(
-                st.session_state.ema_tsi_trade_log,
-                columns=["Timestamp", "Signal", "Price", "Quantity", "PnL"]
+            # Trades only append to the in-memory log while running; build the table and workbook once
+            # the session has stopped and reuse them on every rerun until the log grows again
+            cached = st.session_state.get('ema_tsi_trade_export')
+            if cached is None or cached[0] != n_trades:
+                trade_log = st.session_state.ema_tsi_trade_log
+                cached = (
+                    n_trades,
+                    pd.DataFrame(trade_log),
+                    export_trade_log(trade_log).getvalue()
+                )
+                st.session_state.ema_tsi_trade_export = cached
+            st.dataframe(cached[1])
+            st.download_button(
+                "Download Trade Log (Excel)",
+                data=cached[2],
+                file_name="EMA_TSI_Trades.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="ema_tsi_trade_log_download"
             )
-            st.dataframe(log_df)
 
 
+BACKTEST_CACHE_ENTRIES = 32
+
+def _cached_backtest_run(symbol, start_date, end_date, interval, ema_period, tsi_r_period, stoploss, target, initial_capital, fyers):
+    return backtest_strategy(
+        symbol, start_date, end_date, fyers,
+        stoploss=stoploss,
+        target=target,
+        initial_capital=initial_capital,
+        interval=interval,
+        ema_period=ema_period,
+        tsi_r_period=tsi_r_period
+    )
+
+@st.cache_data(persist="disk", max_entries=BACKTEST_CACHE_ENTRIES, show_spinner=False)
+def _cached_backtest(symbol, start_date, end_date, interval, ema_period, tsi_r_period, stoploss, target, initial_capital, _fyers):
+    """backtest_strategy memoized on its inputs, kept on disk; only for ranges that ended before today."""
+    return _cached_backtest_run(
+        symbol, start_date, end_date, interval, ema_period, tsi_r_period, stoploss, target, initial_capital, _fyers
+    )
+
+@st.cache_data(max_entries=BACKTEST_CACHE_ENTRIES, show_spinner=False)
+def _cached_live_backtest(symbol, start_date, end_date, interval, ema_period, tsi_r_period, stoploss, target, initial_capital, as_of, _fyers):
+    """In-memory memo for ranges reaching today; as_of (the current bar) expires the entry when the bar closes."""
+    return _cached_backtest_run(
+        symbol, start_date, end_date, interval, ema_period, tsi_r_period, stoploss, target, initial_capital, _fyers
+    )
+
 def show_backtest():
     st.subheader("EMA TSI Backtest")
     
@@ -267,18 +246,14 @@ def show_backtest():
     
     if st.button("Run Backtest", key="ema_tsi_run_backtest"):
         with st.spinner("Running backtest..."):
-            result = backtest_strategy(
-                symbol.upper(),
-                start_date.strftime("%Y-%m-%d"),
-                end_date.strftime("%Y-%m-%d"),
-                st.session_state.fyers_client,
-                stoploss=stoploss,
-                target=target,
-                initial_capital=initial_capital,
-                interval=interval,
-                ema_period=ema_period,
-                tsi_r_period=tsi_r_period
-            )
+            args = (symbol.upper(), start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"),
+                    interval, ema_period, tsi_r_period, stoploss, target, initial_capital)
+            if end_date >= datetime.now().date():
+                # A range reaching today still gains bars: memory-only, and only until the current bar closes
+                as_of = int(time.time() // INTERVAL_SECONDS.get(interval, 60))
+                result = _cached_live_backtest(*args, as_of, st.session_state.fyers_client)
+            else:
+                result = _cached_backtest(*args, st.session_state.fyers_client)
             
             if result and result[0] is not None:
                 ha_data, trades, perf_summary, perf_metrics, trade_history_df, account_df = result
@@ -300,14 +275,25 @@ def show_backtest():
                     st.metric("Win Rate", f"{perf_metrics['Win Rate']:.2f}%")
                 
                 st.markdown("### Trade History")
-                st.dataframe(trade_history_df, width='stretch')
+                st.dataframe(format_trade_history(trade_history_df), width='stretch')
                 
                 st.markdown("### Backtest Chart")
+                # plotly is only needed for this chart; importing here keeps it off every page load
+                import plotly.graph_objects as go
+                from plotly.subplots import make_subplots
+
+                # Marker points straight from the signal and close arrays, without copying ha_data per side
+                sig = ha_data['Signal'].to_numpy()
+                hac = ha_data['HA_Close'].to_numpy()
+                idx = ha_data.index
+                # Signal positions found once and reused for both the x and y of each marker trace
+                buy_pos = np.flatnonzero(sig == 1)
+                sell_pos = np.flatnonzero(sig == -1)
                 
                 fig = make_subplots(specs=[[{"secondary_y": True}]])
 
                 fig.add_trace(
-                    go.Scatter(x=ha_data.index, y=ha_data['HA_Close'], name="Price (HA Close)", line=dict(color='black')),
+                    go.Scatter(x=idx, y=hac, name="Price (HA Close)", line=dict(color='black')),
                     secondary_y=False,
                 )
 
@@ -316,11 +302,10 @@ def show_backtest():
                     secondary_y=True,
                 )
 
-                buy_signals = ha_data[ha_data['Signal'] == 1]
                 fig.add_trace(
                     go.Scatter(
-                        x=buy_signals.index, 
-                        y=buy_signals['HA_Close'], 
+                        x=idx[buy_pos], 
+                        y=hac[buy_pos], 
                         name='Buy Signal', 
                         mode='markers', 
                         marker=dict(symbol='triangle-up', color='green', size=10)
@@ -328,11 +313,10 @@ def show_backtest():
                     secondary_y=False,
                 )
 
-                sell_signals = ha_data[ha_data['Signal'] == -1]
                 fig.add_trace(
                     go.Scatter(
-                        x=sell_signals.index, 
-                        y=sell_signals['HA_Close'], 
+                        x=idx[sell_pos], 
+                        y=hac[sell_pos], 
                         name='Sell Signal', 
                         mode='markers', 
                         marker=dict(symbol='triangle-down', color='red', size=10)
@@ -1,10 +1,15 @@
 # strategy.py
+import time
 from datetime import timedelta
 import pandas as pd
 import numpy as np
-from common.data_downloader import download_data_fyers
+from common.data_downloader import download_data_fyers, client_key, INTERVAL_SECONDS
 from common.indicators import heikin_ashi, ema_lows, ema_highs, calculate_tsi
-from common.utils import to_local
+from common.utils import to_local, format_trade_history, LRUCache
+
+_MIN_CANDLE_TTL = 5
+# (expires, HA candles) per (client, ticker, interval)
+_candle_cache = LRUCache(maxsize=64)
 
 def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10, initial_capital=10000, interval='1d'):
     # Download intraday and daily data
@@ -29,16 +34,26 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
     print(D_Data.head())
     print(ha_data.tail())
 
-    # Prepare signals and positions
-    ha_data['Signal'] = 0
-    ha_data['Position'] = 0
+    # Prepare signals and positions; written by bar position and assigned to ha_data once
+    n = len(ha_data)
+    signal_arr = np.zeros(n, dtype=np.int64)
+    position_arr = np.zeros(n, dtype=np.int64)
+
+    # Last daily HA_Open at least one day before each bar, looked up once instead of slicing D_Data per bar
+    daily_open = D_Data['HA_Open'].rename('yest')
+    # merge_asof needs matching datetime resolutions; adding a Timedelta can change the unit
+    daily_open.index = (daily_open.index + pd.Timedelta(days=1)).as_unit(ha_data.index.unit)
+    yest_open_arr = pd.merge_asof(
+        pd.DataFrame({'date': ha_data.index}), daily_open.rename_axis('date').reset_index(),
+        on='date', direction='backward'
+    )['yest'].to_numpy()
 
     capital = float(initial_capital)
     position = 0
     shares = 0.0
     entry_price = None
     trades = []
-    account_value_history = []
+    acct_arr = np.empty(n)
 
     for i in range(1, len(ha_data)):
         row = ha_data.iloc[i]
@@ -62,11 +77,7 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
         #     yest_ha_open = None
 
         # Retrieve the last available daily HA_Open before today
-        prev_daily = D_Data.loc[:date - pd.Timedelta(days=1)]
-        if not prev_daily.empty:
-            yest_ha_open = float(prev_daily['HA_Open'].iloc[-1])
-        else:
-            yest_ha_open = None
+        yest_ha_open = float(yest_open_arr[i]) if not np.isnan(yest_open_arr[i]) else None
 
         # Entry Condition - Always enter if no position
         if position == 0:
@@ -76,7 +87,7 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
             capital = 0  # fully invested
             shares = quantity
             position = 1
-            ha_data.at[date, 'Signal'] = 1
+            signal_arr[i] = 1
             trades.append((local_date, local_date.strftime("%H:%M"), "BUY", price, quantity, trade_cost))
         else:
             exit_condition = False
@@ -93,12 +104,13 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
                 quantity = shares
                 shares = 0.0
                 position = 0
-                ha_data.at[date, 'Signal'] = -1
+                signal_arr[i] = -1
                 trades.append((local_date, local_date.strftime("%H:%M"), "SELL", price, quantity, trade_value))
                 
-        ha_data.at[date, 'Position'] = position
-        current_value = shares * price if position == 1 else capital
-        account_value_history.append((date, current_value))
+        position_arr[i] = position
+        acct_arr[i] = shares * price if position == 1 else capital
+    acct_dates = ha_data.index[1:]
+    acct_values = acct_arr[1:]
 
     # Close any open position at the end
     if position == 1:
@@ -108,11 +120,15 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
         trade_value = shares * last_price
         capital += trade_value
         trades.append((local_last_date, local_last_date.strftime("%H:%M"), "SELL", last_price, shares, trade_value))
-        ha_data.at[last_date, 'Signal'] = -1
-        ha_data.at[last_date, 'Position'] = 0
-        account_value_history.append((last_date, capital))
+        signal_arr[n - 1] = -1
+        position_arr[n - 1] = 0
+        acct_dates = acct_dates.append(ha_data.index[-1:])
+        acct_values = np.append(acct_values, capital)
         position = 0
 
+    ha_data['Signal'] = signal_arr
+    ha_data['Position'] = position_arr
+
     total_return = (capital - initial_capital) / initial_capital * 100
     print(f"Initial Capital: ${initial_capital:.2f}")
     print(f"Final Capital: ${capital:.2f}")
@@ -123,37 +139,30 @@ def backtest_strategy(ticker, start_date, end_date, fyers, stoploss=5, target=10
     buy_hold_return = (last_price / first_price - 1) * 100
     print(f"Buy and Hold Return: {buy_hold_return:.2f}%")
 
-    account_df = pd.DataFrame(account_value_history, columns=['Date', 'AccountValue'])
-    account_df.set_index('Date', inplace=True)
-    running_max = account_df['AccountValue'].cummax()
-    drawdown = (account_df['AccountValue'] - running_max) / running_max
-    max_drawdown = drawdown.min() * 100
+    account_df = pd.DataFrame({'AccountValue': acct_values}, index=acct_dates.rename('Date'))
+    running_max = np.maximum.accumulate(acct_values)
+    drawdown = (acct_values - running_max) / running_max
+    max_drawdown = drawdown.min() * 100 if drawdown.size else np.nan
     print(f"Maximum Drawdown: {max_drawdown:.2f}%")
 
     # Compute trade return metrics
-    trade_returns = []
-    open_buy_price = None
-    for trade in trades:
-        if trade[2] == "BUY":
-            open_buy_price = trade[3]
-        elif trade[2] == "SELL" and open_buy_price is not None:
-            ret = (trade[3] / open_buy_price - 1) * 100
-            trade_returns.append(ret)
-            open_buy_price = None
+    trade_prices = np.fromiter((trade[3] for trade in trades), dtype=np.float64, count=len(trades))
+    trade_is_buy = np.fromiter((trade[2] == "BUY" for trade in trades), dtype=np.bool_, count=len(trades))
+    # Trades alternate BUY/SELL, so the n-th SELL closes the n-th BUY
+    buys = trade_prices[trade_is_buy]
+    sells = trade_prices[~trade_is_buy]
+    pairs = min(len(buys), len(sells))
+    trade_returns = (sells[:pairs] / buys[:pairs] - 1) * 100
 
     num_trades = len(trade_returns)
-    winning_trades = sum(1 for r in trade_returns if r > 0)
-    losing_trades = sum(1 for r in trade_returns if r <= 0)
+    winning_trades = int((trade_returns > 0).sum())
+    losing_trades = num_trades - winning_trades
     win_rate = (winning_trades / num_trades * 100) if num_trades > 0 else 0
-    avg_trade_return = np.mean(trade_returns) if trade_returns else 0
+    avg_trade_return = trade_returns.mean() if num_trades else 0
 
     trade_history_df = pd.DataFrame(trades, columns=['Date', 'Hour', 'Signal', 'Price', 'Quantity', 'Value'])
-    trade_history_df['Date'] = pd.to_datetime(trade_history_df['Date']).dt.strftime("%d-%b-%Y")
-    trade_history_df['Price'] = trade_history_df['Price'].round(2)
-    trade_history_df['Quantity'] = trade_history_df['Quantity'].round(4)
-    trade_history_df['Value'] = trade_history_df['Value'].round(2)
     print("\nTrade History:")
-    print(trade_history_df.to_string(index=False))
+    print(format_trade_history(trade_history_df).to_string(index=False))
 
     # Return data, trade history, performance summaries, and the account DataFrame
     perf_summary = {
@@ -177,16 +186,32 @@ def should_enter_trade(fyers, ticker, live_price, interval="1m"):
     # Always return True to take trade immediately
     return True
 
-def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price, interval="1m"):
-    from datetime import datetime, timedelta
-    # Download recent historical data to compute previous candle's HA values.
+def _recent_ha(fyers, ticker, interval):
+    """Return HA candles for the last two days, re-downloaded only after the current bar has closed."""
+    key = (client_key(fyers), ticker, interval)
+    now = time.time()
+    cached = _candle_cache.get(key)
+    if cached and now < cached[0]:
+        return cached[1]
+
+    from datetime import datetime
     start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
     end_date = datetime.now().strftime("%Y-%m-%d")
     df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
     if df is None or len(df) < 2:
-        return False
-    ha_df = heikin_ashi(df)
-    if len(ha_df) < 2:
+        ha_df = None
+        expires = now + _MIN_CANDLE_TTL
+    else:
+        ha_df = heikin_ashi(df)
+        # The last candle is the one still forming; keep it until its bar rolls over
+        bar_close = ha_df.index[-1].timestamp() + INTERVAL_SECONDS.get(interval, 60)
+        expires = max(bar_close, now + _MIN_CANDLE_TTL)
+    _candle_cache[key] = (expires, ha_df)
+    return ha_df
+
+def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price, interval="1m"):
+    ha_df = _recent_ha(fyers, ticker, interval)
+    if ha_df is None:
         return False
     
     prev_candle = ha_df.iloc[-2]
@@ -206,6 +231,40 @@ def should_exit_trade(fyers, ticker, entry_price, stoploss, target, live_price,
     
     return False
 
+def get_condition_values(fyers, ticker, live_price, interval, stoploss, target):
+    """Get all condition values for display in GUI"""
+    try:
+        ha_df = _recent_ha(fyers, ticker, interval)
+        if ha_df is None:
+            return {
+                'prev_open': 0,
+                'prev_close': 0,
+                'prev_low': 0,
+                'stoploss_price': 0,
+                'target_price': 0
+            }
+        
+        prev_candle = ha_df.iloc[-2]
+        prev_open = float(prev_candle['HA_Open'])
+        prev_close = float(prev_candle['HA_Close'])
+        prev_low = float(prev_candle['HA_Low'])
+        
+        return {
+            'prev_open': prev_open,
+            'prev_close': prev_close,
+            'prev_low': prev_low,
+            'stoploss_price': 0,
+            'target_price': 0
+        }
+    except Exception as e:
+        return {
+            'prev_open': 0,
+            'prev_close': 0,
+            'prev_low': 0,
+            'stoploss_price': 0,
+            'target_price': 0
+        }
+
 if __name__ == '__main__':
     # For testing your strategy; requires a Fyers client.
     from common.login import initialize_fyers_client
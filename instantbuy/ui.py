@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import time
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import sys
 import os
@@ -10,10 +9,11 @@ import os
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from common.data_downloader import download_data_fyers
-from common.indicators import heikin_ashi
-from common.utils import to_local, export_to_excel
-from instantbuy.i_strategy import backtest_strategy, should_enter_trade, should_exit_trade
+from common.data_downloader import get_latest_price, INTERVAL_SECONDS
+from common.utils import to_local, export_to_excel, format_trade_history
+from instantbuy.i_strategy import backtest_strategy, should_enter_trade, should_exit_trade, get_condition_values
+
+UNCHANGED_TICK_SECONDS = 5
 
 def initialize_trading_state():
     if 'instantbuy_position' not in st.session_state:
@@ -27,64 +27,6 @@ def initialize_trading_state():
     if 'instantbuy_running' not in st.session_state:
         st.session_state.instantbuy_running = False
 
-def get_latest_price(fyers, ticker):
-    try:
-        response = fyers.quotes({"symbols": ticker})
-        if (response and "d" in response and len(response["d"]) > 0 and 
-            "v" in response["d"][0] and "lp" in response["d"][0]["v"]):
-            price = float(response["d"][0]["v"]["lp"])
-            if price > 0:
-                return price
-        return None
-    except Exception as e:
-        return None
-
-def get_condition_values(fyers, ticker, live_price, interval, stoploss, target):
-    """Get all condition values for display in GUI"""
-    try:
-        start_date = (datetime.now() - timedelta(days=2)).strftime("%Y-%m-%d")
-        end_date = datetime.now().strftime("%Y-%m-%d")
-        df = download_data_fyers(ticker, start_date, end_date, period_days=2, gui_resolution=interval, fyers=fyers)
-        if df is None or len(df) < 2:
-            return {
-                'prev_open': 0,
-                'prev_close': 0,
-                'prev_low': 0,
-                'stoploss_price': 0,
-                'target_price': 0
-            }
-        
-        ha_df = heikin_ashi(df)
-        if len(ha_df) < 2:
-            return {
-                'prev_open': 0,
-                'prev_close': 0,
-                'prev_low': 0,
-                'stoploss_price': 0,
-                'target_price': 0
-            }
-        
-        prev_candle = ha_df.iloc[-2]
-        prev_open = float(prev_candle['HA_Open'])
-        prev_close = float(prev_candle['HA_Close'])
-        prev_low = float(prev_candle['HA_Low'])
-        
-        return {
-            'prev_open': prev_open,
-            'prev_close': prev_close,
-            'prev_low': prev_low,
-            'stoploss_price': 0,
-            'target_price': 0
-        }
-    except Exception as e:
-        return {
-            'prev_open': 0,
-            'prev_close': 0,
-            'prev_low': 0,
-            'stoploss_price': 0,
-            'target_price': 0
-        }
-
 def show_trade():
     st.subheader("Instant Buy Strategy - Live Trading")
     
@@ -114,13 +56,15 @@ def show_trade():
         
         conditions_placeholder = st.empty()
     
+    sym = symbol.upper()
+    
     if st.session_state.instantbuy_running:
         st.session_state.instantbuy_running = True
         
         if st.button("Stop Trading", key="ib_stop"):
             st.session_state.instantbuy_running = False
             if st.session_state.instantbuy_position == 1:
-                price = get_latest_price(st.session_state.fyers_client, symbol.upper())
+                price = get_latest_price(st.session_state.fyers_client, sym)
                 if price:
                     dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     pnl = (price - st.session_state.instantbuy_entry_price) * st.session_state.instantbuy_qty
@@ -140,9 +84,18 @@ def show_trade():
         update_count = 0
         max_updates = 60
         
+        # Condition panel layout is built once; each tick only rewrites its placeholders
+        with conditions_placeholder.container():
+            st.markdown("#### Condition Values")
+            cond_col1, cond_col2 = st.columns(2)
+            cond_placeholders = {key: cond_col1.empty() for key in ('prev_open', 'prev_close', 'prev_low')}
+            cond_placeholders.update({key: cond_col2.empty() for key in ('sl', 'target')})
+        cond_text = {}
+        last_tick = (None, 0.0)
+        
         while st.session_state.instantbuy_running and update_count < max_updates:
             try:
-                price = get_latest_price(st.session_state.fyers_client, symbol.upper())
+                price = get_latest_price(st.session_state.fyers_client, sym)
                 
                 if price is None:
                     status_placeholder.warning("Waiting for valid market data...")
@@ -151,13 +104,23 @@ def show_trade():
                     progress_bar.progress(min(update_count / max_updates, 0.99))
                     continue
                 
-                now = datetime.now().strftime("%H:%M:%S")
-                dt = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                # Same price and position in the same bar as a recent tick: rules and panel cannot have changed
+                tick_key = (price, st.session_state.instantbuy_position, int(time.time() // INTERVAL_SECONDS.get(interval, 60)))
+                if tick_key == last_tick[0] and time.time() - last_tick[1] < UNCHANGED_TICK_SECONDS:
+                    time.sleep(1)
+                    update_count += 1
+                    progress_bar.progress(min(update_count / max_updates, 0.99))
+                    continue
+                last_tick = (tick_key, time.time())
+                
+                now_dt = datetime.now()
+                now = now_dt.strftime("%H:%M:%S")
+                dt = now_dt.strftime("%Y-%m-%d %H:%M:%S")
                 
                 price_placeholder.metric("Current Price", f"₹{price:.2f}")
                 
                 if st.session_state.instantbuy_position == 0:
-                    if should_enter_trade(st.session_state.fyers_client, symbol.upper(), price, interval):
+                    if should_enter_trade(st.session_state.fyers_client, sym, price, interval):
                         st.session_state.instantbuy_entry_price = price
                         st.session_state.instantbuy_entry_time = now
                         st.session_state.instantbuy_qty = qty
@@ -168,7 +131,7 @@ def show_trade():
                     else:
                         status_placeholder.info("Waiting for entry signal...")
                 else:
-                    if should_exit_trade(st.session_state.fyers_client, symbol.upper(), st.session_state.instantbuy_entry_price, stoploss, target, price, interval):
+                    if should_exit_trade(st.session_state.fyers_client, sym, st.session_state.instantbuy_entry_price, stoploss, target, price, interval):
                         pnl = (price - st.session_state.instantbuy_entry_price) * qty
                         st.session_state.instantbuy_trade_log.append([dt, "SELL", price, qty, round(pnl, 2)])
                         pnl_placeholder.metric("P&L", f"₹{pnl:.2f}", delta=f"{((pnl / (st.session_state.instantbuy_entry_price * qty)) * 100):.2f}%")
@@ -185,17 +148,19 @@ def show_trade():
                             current_pnl = (price - st.session_state.instantbuy_entry_price) * qty
                             pnl_placeholder.metric("Current P&L", f"₹{current_pnl:.2f}", delta=f"{((current_pnl / (st.session_state.instantbuy_entry_price * qty)) * 100):.2f}%")
                 
-                conditions = get_condition_values(st.session_state.fyers_client, symbol.upper(), price, interval, stoploss, target)
-                with conditions_placeholder.container():
-                    st.markdown("#### Condition Values")
-                    cond_col1, cond_col2 = st.columns(2)
-                    with cond_col1:
-                        st.write(f"Prev Open: ₹{conditions['prev_open']:.2f}")
-                        st.write(f"Prev Close: ₹{conditions['prev_close']:.2f}")
-                        st.write(f"Prev Low: ₹{conditions['prev_low']:.2f}")
-                    with cond_col2:
-                        st.write(f"SL Price: ₹{st.session_state.instantbuy_entry_price * (1 - stoploss / 100):.2f}" if st.session_state.instantbuy_position == 1 else f"SL: {stoploss}%")
-                        st.write(f"Target Price: ₹{st.session_state.instantbuy_entry_price * (1 + target / 100):.2f}" if st.session_state.instantbuy_position == 1 else f"Target: {target}%")
+                conditions = get_condition_values(st.session_state.fyers_client, sym, price, interval, stoploss, target)
+                cond_values = {
+                    'prev_open': f"Prev Open: ₹{conditions['prev_open']:.2f}",
+                    'prev_close': f"Prev Close: ₹{conditions['prev_close']:.2f}",
+                    'prev_low': f"Prev Low: ₹{conditions['prev_low']:.2f}",
+                    'sl': f"SL Price: ₹{st.session_state.instantbuy_entry_price * (1 - stoploss / 100):.2f}" if st.session_state.instantbuy_position == 1 else f"SL: {stoploss}%",
+                    'target': f"Target Price: ₹{st.session_state.instantbuy_entry_price * (1 + target / 100):.2f}" if st.session_state.instantbuy_position == 1 else f"Target: {target}%"
+                }
+                # Only send the lines whose text changed since the last tick
+                for key, text in cond_values.items():
+                    if cond_text.get(key) != text:
+                        cond_text[key] = text
+                        cond_placeholders[key].write(text)
                 
                 time.sleep(1)
                 update_count += 1
@@ -273,14 +238,25 @@ def show_backtest():
                     st.metric("Win Rate", f"{perf_metrics['Win Rate']:.2f}%")
                 
                 st.markdown("### Trade History")
-                st.dataframe(trade_history_df, width='stretch')
+                st.dataframe(format_trade_history(trade_history_df), width='stretch')
                 
                 st.markdown("### Backtest Chart")
+                # plotly is only needed for this chart; importing here keeps it off every page load
+                import plotly.graph_objects as go
+                from plotly.subplots import make_subplots
+
+                # Marker points straight from the signal and close arrays, without copying ha_data per side
+                sig = ha_data['Signal'].to_numpy()
+                hac = ha_data['HA_Close'].to_numpy()
+                idx = ha_data.index
+                # Signal positions found once and reused for both the x and y of each marker trace
+                buy_pos = np.flatnonzero(sig == 1)
+                sell_pos = np.flatnonzero(sig == -1)
                 
                 fig = make_subplots(specs=[[{"secondary_y": True}]])
 
                 fig.add_trace(
-                    go.Scatter(x=ha_data.index, y=ha_data['HA_Close'], name="Price (HA Close)", line=dict(color='black')),
+                    go.Scatter(x=idx, y=hac, name="Price (HA Close)", line=dict(color='black')),
                     secondary_y=False,
                 )
 
@@ -289,11 +265,10 @@ def show_backtest():
                     secondary_y=True,
                 )
 
-                buy_signals = ha_data[ha_data['Signal'] == 1]
                 fig.add_trace(
                     go.Scatter(
-                        x=buy_signals.index, 
-                        y=buy_signals['HA_Close'], 
+                        x=idx[buy_pos], 
+                        y=hac[buy_pos], 
                         name='Buy Signal', 
                         mode='markers', 
                         marker=dict(symbol='triangle-up', color='green', size=10)
@@ -301,11 +276,10 @@ def show_backtest():
                     secondary_y=False,
                 )
 
-                sell_signals = ha_data[ha_data['Signal'] == -1]
                 fig.add_trace(
                     go.Scatter(
-                        x=sell_signals.index, 
-                        y=sell_signals['HA_Close'], 
+                        x=idx[sell_pos], 
+                        y=hac[sell_pos], 
                         name='Sell Signal', 
                         mode='markers', 
                         marker=dict(symbol='triangle-down', color='red', size=10)
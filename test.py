@@ -1,10 +1,5 @@
-import tkinter as tk
-from tkinter import ttk
 import pandas as pd
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from common.chart_utils import ChartManager
 
 # Create sample data
 def create_sample_data():
@@ -26,44 +21,8 @@ def create_sample_data():
     df = pd.DataFrame(data, index=dates)
     return df
 
-def on_closing():
-    """Handle window closing"""
-    plt.close('all')  # Close all matplotlib figures
-    root.quit()  # Stop the mainloop
-    root.destroy()  # Destroy the window
-
 def main():
-    global root  # Make root accessible to on_closing
-    # Create the main window
-    root = tk.Tk()
-    root.title("Chart Test")
-    root.state('zoomed')  # Start maximized
-    
-    # Set up window close handler
-    root.protocol("WM_DELETE_WINDOW", on_closing)
-    
-    # Create main container frame
-    main_frame = ttk.Frame(root)
-    main_frame.pack(fill=tk.BOTH, expand=True)
-    
-    # Get screen width and calculate container widths
-    screen_width = root.winfo_screenwidth()
-    left_width = int(screen_width * 0.7)  # 70% of screen width
-    right_width = int(screen_width * 0.3)  # 30% of screen width
-    
-    # Create left container (70% width)
-    left_frame = ttk.Frame(main_frame, relief="groove", borderwidth=2, width=left_width)
-    left_frame.pack(side=tk.LEFT, fill=tk.BOTH, padx=5, pady=5)
-    left_frame.pack_propagate(False)  # Prevent the frame from shrinking
-    
-    # Create right container (30% width)
-    right_frame = ttk.Frame(main_frame, relief="groove", borderwidth=2, width=right_width)
-    right_frame.pack(side=tk.LEFT, fill=tk.BOTH, padx=5, pady=5)
-    right_frame.pack_propagate(False)  # Prevent the frame from shrinking
-    
-    # Add labels to show container sizes
-    ttk.Label(left_frame, text=f"Left Container\n({left_width}px)", font=("Arial", 12)).pack(expand=True)
-    ttk.Label(right_frame, text=f"Right Container\n({right_width}px)", font=("Arial", 12)).pack(expand=True)
+    from common.chart_utils_plotly import ChartManager
     
     # Create sample data
     df = create_sample_data()
@@ -72,35 +31,18 @@ def main():
     chart_manager = ChartManager()
     
     # Create the chart
-    fig, axes = chart_manager.plot_candlestick(
+    fig = chart_manager.plot_candlestick(
         df,
         title="Sample Chart",
         volume=True,
-        returnfig=True,
-        figsize=(left_width/100, 8)  # Adjust width based on container width, maintain height
+        returnfig=True
     )
     
-    # Embed chart in tkinter (in left frame)
-    canvas = FigureCanvasTkAgg(fig, master=left_frame)
-    canvas.draw()
-    
-    # Add toolbar at the top
-    toolbar = NavigationToolbar2Tk(canvas, left_frame)
-    toolbar.pack(side=tk.TOP, fill=tk.X)
-    toolbar.update()
-    
-    # Pack the canvas after the toolbar
-    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+    # Append the next candle in place, as a live feed would
+    next_time = df.index[-1] + timedelta(days=1)
+    chart_manager.append_candle(107, 109, 106, 108, next_time, v=1700)
     
-    try:
-        # Start the main loop
-        root.mainloop()
-    except Exception as e:
-        print(f"Error in mainloop: {e}")
-    finally:
-        # Cleanup
-        plt.close('all')
-        print("Application closed")
+    fig.show()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common.data_downloader as data_downloader
+
+
+class StubFyers:
+    """Daily candles on weekdays for the requested range, or a fixed error response."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def history(self, data):
+        self.calls += 1
+        if self.error is not None:
+            return self.error
+        days = pd.bdate_range(data['range_from'], data['range_to'])
+        rows = [[int(d.tz_localize('Asia/Kolkata').timestamp()) + 33300, 100, 101, 99, 100.5, 10] for d in days]
+        return {'s': 'ok', 'candles': rows} if rows else {'s': 'no_data', 'candles': []}
+
+
+def test_failed_windows_are_not_cached_as_empty_days(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_downloader, 'CACHE_DIR', tmp_path)
+    args = ('NSE:TEST-EQ', '2024-03-04', '2024-03-15')
+
+    failing = StubFyers(error={'s': 'error', 'code': 429, 'message': 'request limit reached'})
+    assert data_downloader.download_data_fyers(*args, gui_resolution='1d', fyers=failing).empty
+    assert not list(tmp_path.rglob('*.parquet'))
+
+    working = StubFyers()
+    df = data_downloader.download_data_fyers(*args, gui_resolution='1d', fyers=working)
+    assert working.calls > 0
+    assert len(df) == 10
+    # Trading days and the weekend in between are cached once the API has answered
+    assert len(list(tmp_path.rglob('*.parquet'))) == 12
+
+    cached = StubFyers()
+    assert len(data_downloader.download_data_fyers(*args, gui_resolution='1d', fyers=cached)) == 10
+    assert cached.calls == 0
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import common.data_downloader as data_downloader
+import ema_tsi.strategy as strategy
+from common.indicators import heikin_ashi, ema_lows, ema_highs, calculate_tsi
+
+
+class StubFyers:
+    """Minute candles for every requested day, up to the stub's clock; the last one is the forming bar."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.calls = 0
+
+    def candles(self, start, end):
+        ts = np.arange(start - start % 60, min(end, self.clock[0]) + 1, 60)
+        close = 100 + 5 * np.sin(ts / 900.0) + (ts % 7) / 10
+        return [[int(t), c - 0.2, c + 0.5, c - 0.5, c, 100] for t, c in zip(ts, close)]
+
+    def history(self, data):
+        self.calls += 1
+        start = pd.Timestamp(data['range_from'], tz='Asia/Kolkata')
+        end = pd.Timestamp(data['range_to'], tz='Asia/Kolkata') + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+        rows = self.candles(int(start.timestamp()), int(end.timestamp()))
+        return {'s': 'ok', 'candles': rows} if rows else {'s': 'no_data', 'candles': []}
+
+
+def _expected(fyers):
+    """Indicator rows for the last closed and the forming candle, recomputed from scratch."""
+    start = int((pd.Timestamp.now(tz='Asia/Kolkata').normalize() - pd.Timedelta(days=7)).timestamp())
+    arr = np.asarray(fyers.candles(start, fyers.clock[0]), dtype=np.float64)
+    df = pd.DataFrame(arr[:, 1:5], columns=['open', 'high', 'low', 'close'])
+    ha = heikin_ashi(df)
+    ha['EMA_Lows'] = ema_lows(ha)
+    ha['EMA_Highs'] = ema_highs(ha)
+    ha['TSI'], ha['TSI_Signal'] = calculate_tsi(ha['HA_Close'])
+    return ha.iloc[-2], ha.iloc[-1]
+
+
+def test_live_indicator_rows_follow_a_bar_close(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_downloader, 'CACHE_DIR', tmp_path)
+    clock = [float(int(time.time()) // 60 * 60)]
+    monkeypatch.setattr(strategy, 'time', SimpleNamespace(time=lambda: clock[0]))
+    fyers = StubFyers(clock)
+
+    first = strategy.live_indicator_rows(fyers, 'NSE:TEST-EQ')
+    assert first is not None
+    calls = fyers.calls
+
+    # Next bar opens: the previous forming candle is now closed
+    clock[0] += 60
+    second = strategy.live_indicator_rows(fyers, 'NSE:TEST-EQ')
+    assert second is not None
+    assert fyers.calls > calls
+
+    for row, expected in zip(second, _expected(fyers)):
+        for column, value in row.items():
+            assert np.isclose(value, expected[column], rtol=1e-9, atol=1e-9, equal_nan=True), column
+    # The candle that was forming on the first call is the committed one now
+    assert np.isclose(second[0]['HA_Close'], first[1]['HA_Close'])
+
+
+def test_forming_candle_follows_the_live_price(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_downloader, 'CACHE_DIR', tmp_path)
+    clock = [float(int(time.time()) // 60 * 60 + 10)]
+    monkeypatch.setattr(strategy, 'time', SimpleNamespace(time=lambda: clock[0]))
+    fyers = StubFyers(clock)
+
+    prev, forming = strategy.live_indicator_rows(fyers, 'NSE:TEST-EQ', live_price=90.0)
+    calls = fyers.calls
+    clock[0] += 20
+    prev_again, rallied = strategy.live_indicator_rows(fyers, 'NSE:TEST-EQ', live_price=120.0)
+
+    # Same bar: no download, the committed candle is unchanged, the forming one tracks the tick
+    assert fyers.calls == calls
+    assert prev_again is prev
+    assert rallied['HA_Close'] > forming['HA_Close']
+    assert rallied['TSI'] > forming['TSI']
+    # The earlier 90.0 tick is still the forming candle's low
+    assert rallied['HA_Low'] <= 90.0